@@ -1,41 +1,280 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
-from pydantic import BaseModel, HttpUrl
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse, Response, PlainTextResponse
+import json
+import os
+from datetime import datetime
+from typing import Literal
+from pydantic import BaseModel, Field, HttpUrl, ValidationError
 
-from app.db.repo import ScanRepo
-from app.jobs.scheduler import enqueue_scan
+from app.config import settings
+from app.core.urls import parse_url_list
+from app.db.repo import ScanRepo, ResultCacheRepo, BatchRepo, RobotsCacheRepo
+from app.jobs.scheduler import enqueue_scan, enqueue_batch
+from app.reports.service import render_report, report_etag
+from app.core.metrics import render_metrics
+from app.core.robots import cache_stats as robots_process_stats
 
 router = APIRouter()
 
 class ScanRequest(BaseModel):
     url: HttpUrl
+    mode: Literal["page", "crawl"] = "page"
+    # Crawl options (mode == "crawl"); server defaults apply when omitted
+    max_pages: int | None = Field(default=None, ge=1, le=1000)
+    max_depth: int | None = Field(default=None, ge=0, le=10)
+    use_sitemap: bool | None = None
+    # Re-run axe even if the page is unchanged since the last scan
+    force_refresh: bool = False
+    # Start a new scan even if this URL finished within SCAN_REUSE_WINDOW_SECONDS
+    force: bool = False
+
+class BatchRequest(BaseModel):
+    # Validated and normalised one by one; invalid entries are reported, not fatal
+    urls: list[str] = Field(min_length=1)
+    mode: Literal["page", "crawl"] = "page"
+    name: str | None = Field(default=None, max_length=200)
+    max_pages: int | None = Field(default=None, ge=1, le=1000)
+    max_depth: int | None = Field(default=None, ge=0, le=10)
+    use_sitemap: bool | None = None
+    force_refresh: bool = False
+
+# Rejected URLs listed in a batch response
+BATCH_MAX_REPORTED_INVALID = 100
+# Request size allowed per URL of BATCH_MAX_URLS (URL, quoting, comments), so huge bodies are refused unread
+BATCH_BYTES_PER_URL = 2048
+UPLOAD_CHUNK_BYTES = 64 * 1024
+
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"At most {settings.batch_max_urls} URLs per batch")
+
+async def _read_body(request: Request, max_bytes: int) -> bytes:
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise _too_large()
+    return bytes(body)
+
+async def _upload_lines(upload, max_bytes: int) -> list[str]:
+    """Lines of an uploaded file, read in chunks; 413 once it lists more than BATCH_MAX_URLS entries."""
+    lines: list[str] = []
+    entries = 0
+    size = 0
+    rest = b""
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+        size += len(chunk)
+        if size > max_bytes:
+            raise _too_large()
+        parts = (rest + chunk).split(b"\n")
+        rest = parts.pop()
+        if not chunk and rest:
+            parts.append(rest)
+        for part in parts:
+            # splitlines also breaks old-Mac "\r" line endings
+            for line in part.decode("utf-8", errors="replace").splitlines() or [""]:
+                if not lines:
+                    line = line.removeprefix("\ufeff")
+                lines.append(line)
+                stripped = line.strip()
+                entries += bool(stripped) and not stripped.startswith("#")
+        if entries > settings.batch_max_urls:
+            raise _too_large()
+        if not chunk:
+            return lines
+
+async def _batch_request(request: Request) -> BatchRequest:
+    """A JSON array / object, or a multipart upload ("file") of one URL per line plus form fields."""
+    max_bytes = settings.batch_max_urls * BATCH_BYTES_PER_URL
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        raise _too_large()
+    try:
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(status_code=400, detail="Upload a newline-delimited file as 'file'")
+            lines = await _upload_lines(upload, max_bytes)
+            fields = {k: v for k, v in form.items() if k != "file"}
+            return BatchRequest.model_validate({**fields, "urls": lines})
+        try:
+            body = json.loads(await _read_body(request, max_bytes))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Expected a JSON body or a multipart file upload")
+        return BatchRequest.model_validate({"urls": body} if isinstance(body, list) else body)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
 
 @router.get("/health")
 def health():
     return {"status": "ok"}
 
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@router.get("/cache/stats")
+def cache_stats():
+    # robots: totals over all processes, plus this API process's own counters (incl. in-memory hits)
+    return {**ResultCacheRepo.stats(), "robots": {**RobotsCacheRepo.stats(), "process": robots_process_stats()}}
+
 @router.post("/scan")
 def create_scan(req: ScanRequest):
-    scan_id = enqueue_scan(str(req.url))
-    return {"scan_id": scan_id, "status": "queued"}
+    scan_id, coalesced = enqueue_scan(
+        str(req.url), mode=req.mode, max_pages=req.max_pages, max_depth=req.max_depth, use_sitemap=req.use_sitemap,
+        force_refresh=req.force_refresh, force=req.force,
+    )
+    if not coalesced:
+        return {"scan_id": scan_id, "status": "queued", "coalesced": False}
+    scan = ScanRepo.get_scan(scan_id)
+    return {"scan_id": scan_id, "status": scan["status"] if scan else "queued", "coalesced": True}
+
+@router.post("/scans/batch")
+async def create_batch(request: Request):
+    req = await _batch_request(request)
+    urls, duplicates, invalid = parse_url_list(req.urls)
+    if len(urls) > settings.batch_max_urls:
+        raise _too_large()
+    if not urls:
+        raise HTTPException(status_code=422, detail={"message": "No valid URLs", "invalid": invalid[:BATCH_MAX_REPORTED_INVALID]})
+    batch_id = await run_in_threadpool(
+        enqueue_batch, urls, mode=req.mode, name=req.name, duplicates=duplicates, rejected=len(invalid),
+        max_pages=req.max_pages, max_depth=req.max_depth, use_sitemap=req.use_sitemap, force_refresh=req.force_refresh,
+    )
+    return {
+        "batch_id": batch_id,
+        "status": "queued",
+        "accepted": len(urls),
+        "duplicates": duplicates,
+        "rejected": len(invalid),
+        "invalid": invalid[:BATCH_MAX_REPORTED_INVALID],
+    }
+
+@router.get("/batch/{batch_id}")
+def get_batch(batch_id: int):
+    batch = BatchRepo.get_batch(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
+
+@router.get("/batch/{batch_id}/summary")
+def get_batch_summary(batch_id: int, top: int = Query(default=10, ge=1, le=100)):
+    batch = BatchRepo.get_batch(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return {**BatchRepo.summary(batch_id, top_n=top), "progress": batch["progress"], "finished": batch["finished"]}
 
 @router.get("/scan/{scan_id}")
-def get_scan(scan_id: int):
-    scan = ScanRepo.get_scan(scan_id)
+def get_scan(scan_id: int, include_findings: bool = False):
+    scan = ScanRepo.get_scan(scan_id, include_findings=include_findings)
     if not scan:
         raise HTTPException(status_code=404, detail="Scan not found")
     return scan
 
+@router.get("/scan/{scan_id}/findings")
+def get_scan_findings(
+    scan_id: int,
+    cursor: int | None = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    severity: str | None = Query(default=None, description="Comma-separated, e.g. critical,serious"),
+    rule: str | None = None,
+    viewport: str | None = None,
+    wcag: str | None = Query(default=None, description="WCAG criterion, e.g. 1.4.3"),
+    page_id: int | None = None,
+    fields: str | None = Query(default=None, description="Comma-separated finding fields to return"),
+):
+    if not ScanRepo.get_scan(scan_id):
+        raise HTTPException(status_code=404, detail="Scan not found")
+    return ScanRepo.list_findings(
+        scan_id,
+        after_id=cursor,
+        limit=limit,
+        severity=severity.split(",") if severity else None,
+        rule_id=rule,
+        viewport=viewport,
+        wcag=wcag,
+        page_id=page_id,
+        fields=fields.split(",") if fields else None,
+    )
+
+@router.get("/scan/{base_id}/diff/{head_id}")
+def diff_scans(
+    base_id: int,
+    head_id: int,
+    limit: int = Query(default=500, ge=1, le=5000),
+    fields: str | None = Query(default=None, description="Comma-separated finding fields to return"),
+):
+    for scan_id in (base_id, head_id):
+        if not ScanRepo.get_scan(scan_id):
+            raise HTTPException(status_code=404, detail=f"Scan {scan_id} not found")
+    return ScanRepo.diff_findings(base_id, head_id, limit=limit, fields=fields.split(",") if fields else None)
+
+@router.get("/scan/{scan_id}/pages")
+def get_scan_pages(scan_id: int):
+    scan = ScanRepo.get_scan(scan_id)
+    if not scan:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    return {"items": ScanRepo.list_pages(scan_id)}
+
+@router.get("/scan/{scan_id}/screenshot/{viewport}")
+def get_screenshot(scan_id: int, viewport: str, size: Literal["thumb", "full"] = "thumb", tile: int = Query(default=1, ge=1)):
+    scan = ScanRepo.get_scan(scan_id)
+    if not scan:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    shot = (scan.get("screenshots") or {}).get(viewport)
+    if not shot:
+        raise HTTPException(status_code=404, detail="Screenshot not found")
+    if size == "thumb":
+        path = shot.get("thumbnail")
+    else:
+        tiles = shot.get("tiles") or [shot.get("path")]
+        path = tiles[tile - 1] if tile <= len(tiles) else None
+    if not path or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Screenshot not found")
+    return FileResponse(path, headers={"Cache-Control": "private, max-age=86400"})
+
 @router.get("/scans")
-def list_scans(limit: int = 50):
-    return {"items": ScanRepo.list_scans(limit=limit)}
+def list_scans(
+    limit: int = Query(default=50, ge=1, le=500),
+    cursor: int | None = None,
+    status: str | None = None,
+    host: str | None = None,
+    url_prefix: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    include_summary: bool = False,
+    batch_id: int | None = None,
+):
+    return ScanRepo.list_scans(
+        limit=limit,
+        before_id=cursor,
+        status=status,
+        host=host,
+        url_prefix=url_prefix,
+        created_from=created_from,
+        created_to=created_to,
+        include_summary=include_summary,
+        batch_id=batch_id,
+    )
 
 @router.get("/report/{scan_id}.pdf")
-def get_report(scan_id: int):
+def get_report(scan_id: int, request: Request):
     scan = ScanRepo.get_scan(scan_id)
     if not scan:
         raise HTTPException(status_code=404, detail="Scan not found")
-    path = scan.get("report_pdf_path")
+    if scan["status"] != "done":
+        raise HTTPException(status_code=404, detail="Report not available")
+
+    etag = report_etag(scan)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    # Rendered on first request and cached on disk
+    path = render_report(scan_id)
     if not path:
         raise HTTPException(status_code=404, detail="Report not available")
-    return FileResponse(path, media_type="application/pdf", filename=f"bfsg_report_{scan_id}.pdf")
+    return FileResponse(path, media_type="application/pdf", filename=f"bfsg_report_{scan_id}.pdf", headers=headers)
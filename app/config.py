@@ -1,16 +1,41 @@
+from typing import Literal
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
 class Settings(BaseSettings):
     app_name: str = Field(default="bfsg-checker", alias="APP_NAME")
     database_url: str = Field(default="sqlite:///./data/bfsg_checker.sqlite", alias="DATABASE_URL")
+    sqlite_busy_timeout_ms: int = Field(default=10000, alias="SQLITE_BUSY_TIMEOUT_MS")
 
     scan_timeout_ms: int = Field(default=45000, alias="SCAN_TIMEOUT_MS")
     max_navigation_wait_ms: int = Field(default=30000, alias="MAX_NAVIGATION_WAIT_MS")
     user_agent: str = Field(default="BFSGCheckerBot/0.1 (+https://localhost)", alias="USER_AGENT")
+    scan_two_pass: bool = Field(default=False, alias="SCAN_TWO_PASS")
+    scan_viewport_concurrency: int = Field(default=2, alias="SCAN_VIEWPORT_CONCURRENCY")
+    settle_strategy: Literal["adaptive", "networkidle"] = Field(default="adaptive", alias="SETTLE_STRATEGY")
+    settle_quiet_ms: int = Field(default=500, alias="SETTLE_QUIET_MS")
+    settle_min_ms: int = Field(default=1500, alias="SETTLE_MIN_MS")
+    settle_max_ms: int = Field(default=15000, alias="SETTLE_MAX_MS")
+    result_cache: bool = Field(default=True, alias="RESULT_CACHE")
+    normalize_max_nodes: int = Field(default=30, alias="NORMALIZE_MAX_NODES")
 
     allow_robots_deny: bool = Field(default=True, alias="ALLOW_ROBOTS_DENY")
     robots_user_agent: str = Field(default="*", alias="ROBOTS_USER_AGENT")
+    robots_cache_ttl_seconds: int = Field(default=3600, alias="ROBOTS_CACHE_TTL_SECONDS")
+    robots_error_ttl_seconds: int = Field(default=300, alias="ROBOTS_ERROR_TTL_SECONDS")
+
+    host_max_concurrency: int = Field(default=2, alias="HOST_MAX_CONCURRENCY")
+    host_rate_per_minute: float = Field(default=30, alias="HOST_RATE_PER_MINUTE")
+    host_burst: int = Field(default=4, alias="HOST_BURST")
+    respect_crawl_delay: bool = Field(default=True, alias="RESPECT_CRAWL_DELAY")
+    crawl_delay_max_seconds: float = Field(default=30, alias="CRAWL_DELAY_MAX_SECONDS")
+
+    crawl_max_pages: int = Field(default=50, alias="CRAWL_MAX_PAGES")
+    crawl_max_depth: int = Field(default=2, alias="CRAWL_MAX_DEPTH")
+    crawl_concurrency: int = Field(default=2, alias="CRAWL_CONCURRENCY")
+    crawl_max_frontier: int = Field(default=1000, alias="CRAWL_MAX_FRONTIER")
+    batch_max_urls: int = Field(default=10000, alias="BATCH_MAX_URLS")
+    scan_reuse_window_seconds: int = Field(default=300, alias="SCAN_REUSE_WINDOW_SECONDS")
 
     desktop_width: int = Field(default=1280, alias="DESKTOP_WIDTH")
     desktop_height: int = Field(default=720, alias="DESKTOP_HEIGHT")
@@ -18,8 +43,35 @@ class Settings(BaseSettings):
     mobile_height: int = Field(default=844, alias="MOBILE_HEIGHT")
 
     artifacts_dir: str = Field(default="./data/artifacts", alias="ARTIFACTS_DIR")
+    screenshot_format: Literal["png", "jpeg", "webp"] = Field(default="jpeg", alias="SCREENSHOT_FORMAT")
+    screenshot_quality: int = Field(default=80, alias="SCREENSHOT_QUALITY")
+    screenshot_max_height: int = Field(default=20000, alias="SCREENSHOT_MAX_HEIGHT")
+    screenshot_tile_height: int = Field(default=4000, alias="SCREENSHOT_TILE_HEIGHT")
+    thumbnail_width: int = Field(default=800, alias="THUMBNAIL_WIDTH")
+    thumbnail_max_height: int = Field(default=1100, alias="THUMBNAIL_MAX_HEIGHT")
+    retention_max_age_days: int = Field(default=90, alias="RETENTION_MAX_AGE_DAYS")
+    retention_max_scans_per_url: int = Field(default=20, alias="RETENTION_MAX_SCANS_PER_URL")
+    artifacts_max_mb: int = Field(default=0, alias="ARTIFACTS_MAX_MB")
+    artifact_gc_grace_seconds: int = Field(default=3600, alias="ARTIFACT_GC_GRACE_SECONDS")
+    maintenance_interval_seconds: int = Field(default=3600, alias="MAINTENANCE_INTERVAL_SECONDS")
+    report_mode: str = Field(default="lazy", alias="REPORT_MODE")  # lazy/inline
+    scan_block_profile: str = Field(default="none", alias="SCAN_BLOCK_PROFILE")  # none/trackers/media/lean
+    scan_block_globs: str = Field(default="", alias="SCAN_BLOCK_GLOBS")
+    http_cache: bool = Field(default=False, alias="HTTP_CACHE")
+    http_cache_ttl_seconds: int = Field(default=86400, alias="HTTP_CACHE_TTL_SECONDS")
+    har_mode: Literal["off", "record", "replay"] = Field(default="off", alias="HAR_MODE")
+    har_dir: str = Field(default="./data/har", alias="HAR_DIR")
     axe_path: str = Field(default="./vendor/axe/axe.min.js", alias="AXE_PATH")
 
+    worker_concurrency: int = Field(default=1, alias="WORKER_CONCURRENCY")
+    job_lease_seconds: int = Field(default=120, alias="JOB_LEASE_SECONDS")
+    job_max_attempts: int = Field(default=3, alias="JOB_MAX_ATTEMPTS")
+    poll_min_seconds: float = Field(default=0.5, alias="POLL_MIN_SECONDS")
+    poll_max_seconds: float = Field(default=10.0, alias="POLL_MAX_SECONDS")
+    browser_pool_size: int = Field(default=1, alias="BROWSER_POOL_SIZE")
+    browser_max_contexts: int = Field(default=100, alias="BROWSER_MAX_CONTEXTS")
+    browser_max_memory_mb: int = Field(default=1500, alias="BROWSER_MAX_MEMORY_MB")
+
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -0,0 +1,67 @@
+import hashlib
+import os
+import threading
+from pathlib import Path
+from app.config import settings
+
+
+def cas_root() -> Path:
+    return Path(settings.artifacts_dir) / "cas"
+
+
+def cas_path(sha256: str, ext: str) -> Path:
+    # Two levels of fan-out keep directories small
+    return cas_root() / sha256[:2] / sha256[2:4] / f"{sha256}{ext}"
+
+
+def put_bytes(data: bytes, ext: str) -> dict:
+    """Store data under its content hash; identical content is written once.
+
+    Returns {"sha256", "path", "size", "new"}. The caller records a reference with
+    ArtifactRepo.set_refs once the owning scan is done; until then the file is
+    protected from GC by its mtime (see remove_stale).
+    """
+    sha = hashlib.sha256(data).hexdigest()
+    path = cas_path(sha, ext)
+    if path.exists():
+        # Refresh mtime so a concurrent GC pass treats it as recently used
+        try:
+            os.utime(path)
+            return {"sha256": sha, "path": str(path), "size": len(data), "new": False}
+        except FileNotFoundError:
+            pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return {"sha256": sha, "path": str(path), "size": len(data), "new": True}
+
+
+def remove_stale(path: str, cutoff: float) -> int:
+    """Delete a stored file unless it was used (put_bytes) since cutoff; returns the bytes freed.
+
+    The file is moved aside first, so a put_bytes racing with us either touched
+    it before the move (we see the new mtime and put it back) or finds it gone
+    and writes it again.
+    """
+    aside = f"{path}.{os.getpid()}.{threading.get_ident()}.gc.tmp"
+    try:
+        os.rename(path, aside)
+    except FileNotFoundError:
+        return 0
+    if os.path.getmtime(aside) >= cutoff:
+        # Same content under the same name, so this is safe even if put_bytes rewrote it meanwhile
+        os.replace(aside, path)
+        return 0
+    return remove(aside)
+
+
+def remove(path: str) -> int:
+    """Delete a stored file; returns the bytes freed (0 if it was already gone)."""
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except FileNotFoundError:
+        return 0
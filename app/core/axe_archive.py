@@ -0,0 +1,15 @@
+from app.core.artifacts import put_bytes
+from app.core.storage import json_gz_bytes, load_json
+
+# Artifact kind of archived raw axe results (one per viewport, and per page for crawls)
+AXE_RAW_KIND = "axe_raw"
+
+
+def archive_raw(raw: dict, viewport: str, page_id: int | None = None) -> dict:
+    """Store the complete axe output gzipped; returns an artifact reference."""
+    blob = put_bytes(json_gz_bytes(raw), ".json.gz")
+    return {**blob, "kind": AXE_RAW_KIND, "name": viewport, "page_id": page_id}
+
+
+def load_raw(path: str) -> dict:
+    return load_json(path)
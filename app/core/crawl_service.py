@@ -0,0 +1,217 @@
+import asyncio
+from collections import deque
+from urllib.parse import urlsplit
+from app.config import settings
+from app.db.repo import ScanRepo, ArtifactRepo, LeaseLost
+from app.core.robots import is_allowed
+from app.core.sitemap import fetch_sitemap_urls
+from app.core.urls import canonicalize_url, same_site
+from app.domain.viewports import get_viewports
+from app.scanners.page_scan import scan_page
+from app.core.normalize import normalize_axe_results, summarize_findings, summarize_site, merge_viewports
+from app.core.images import screenshot_stats, screenshot_refs, SCREENSHOT_KINDS
+from app.core.axe_archive import archive_raw, AXE_RAW_KIND
+from app.reports.service import render_report
+from app.scanners.browser_pool import BrowserPool
+from app.scanners.interception import new_network_stats, network_summary
+from app.core.timing import stage
+
+# Links to these are downloads, not pages
+SKIP_EXTENSIONS = {
+    ".pdf", ".zip", ".gz", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp",
+    ".mp3", ".mp4", ".webm", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx",
+}
+
+
+class Frontier:
+    """Bounded FIFO of (url, depth) that only admits each canonical URL once.
+
+    Malformed URLs (e.g. a non-numeric port) are counted in `rejected` and skipped.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.dropped = 0
+        self.rejected = 0
+        self._queue: deque[tuple[str, int]] = deque()
+        self._seen: set[str] = set()
+
+    def push(self, url: str, depth: int) -> bool:
+        try:
+            key = canonicalize_url(url)
+        except ValueError:
+            self.rejected += 1
+            return False
+        if key in self._seen:
+            return False
+        if len(self._queue) >= self.max_size:
+            self.dropped += 1
+            return False
+        self._seen.add(key)
+        self._queue.append((key, depth))
+        return True
+
+    def pop(self) -> tuple[str, int] | None:
+        return self._queue.popleft() if self._queue else None
+
+
+def _crawlable(link: str, seed: str) -> bool:
+    parts = urlsplit(link)
+    if parts.scheme not in ("http", "https") or not same_site(link, seed):
+        return False
+    path = parts.path.lower()
+    return not any(path.endswith(ext) for ext in SKIP_EXTENSIONS)
+
+
+async def run_crawl_job_async(scan_id: int, scan: dict, pool: BrowserPool, worker_id: str | None = None):
+    seed = canonicalize_url(scan["url"])
+    max_pages = scan.get("max_pages") or settings.crawl_max_pages
+    max_depth = scan.get("max_depth") if scan.get("max_depth") is not None else settings.crawl_max_depth
+    use_sitemap = scan.get("use_sitemap") if scan.get("use_sitemap") is not None else True
+
+    with stage("robots"):
+        allowed, robots_info = await asyncio.to_thread(is_allowed, seed)
+    if not allowed and settings.allow_robots_deny:
+        failed = await asyncio.to_thread(
+            ScanRepo.set_scan_failed, scan_id, robots_allowed="no", error_message=f"Blocked by robots.txt: {robots_info}",
+            worker_id=worker_id,
+        )
+        if not failed:
+            raise LeaseLost(scan_id)
+        return
+
+    # A retried crawl starts from scratch
+    await asyncio.to_thread(ScanRepo.reset_crawl, scan_id)
+
+    frontier = Frontier(settings.crawl_max_frontier)
+    frontier.push(seed, 0)
+    # A replay only has the pages that were recorded; links found on them are enough
+    if use_sitemap and max_depth > 0 and settings.har_mode != "replay":
+        with stage("sitemap"):
+            sitemap_urls = await asyncio.to_thread(fetch_sitemap_urls, seed, settings.crawl_max_frontier)
+        for u in sitemap_urls:
+            if _crawlable(u, seed):
+                frontier.push(u, 1)
+
+    viewports = get_viewports()
+    # Only the seed page is screenshotted; it is what the report shows
+    screenshots: dict[str, dict] = {}
+
+    pages: list[dict] = []
+    all_findings: list[dict] = []
+    raw_refs: list[dict] = []
+    network = new_network_stats()
+
+    async def audit(page_url: str, depth: int) -> list[str]:
+        if depth > 0:
+            with stage("robots"):
+                page_allowed, _ = await asyncio.to_thread(is_allowed, page_url)
+            if not page_allowed and settings.allow_robots_deny:
+                page_id = await asyncio.to_thread(ScanRepo.add_page, scan_id, page_url, depth)
+                await asyncio.to_thread(ScanRepo.finish_page, page_id, "skipped", error_message="Blocked by robots.txt")
+                pages.append({"id": page_id, "url": page_url, "status": "skipped", "summary": None})
+                return []
+
+        page_id = await asyncio.to_thread(ScanRepo.add_page, scan_id, page_url, depth)
+        findings: list[dict] = []
+        links: list[str] = []
+        try:
+            for i, vp in enumerate(viewports):
+                res = await scan_page(
+                    page_url, vp, depth == 0, pool=pool, collect_links=(i == 0 and depth < max_depth),
+                    network_stats=network,
+                )
+                shot_path = None
+                if res["screenshot"]:
+                    screenshots[vp["name"]] = res["screenshot"]
+                    shot_path = res["screenshot"]["path"]
+                with stage("normalize"):
+                    findings.extend(normalize_axe_results(
+                        res["axe"], viewport_name=vp["name"], screenshot_path=shot_path, page_id=page_id, page_url=page_url,
+                    ))
+                with stage("archive"):
+                    raw_refs.append(await asyncio.to_thread(archive_raw, res["axe"], vp["name"], page_id))
+                links.extend(res["links"])
+        except Exception as e:
+            await asyncio.to_thread(ScanRepo.finish_page, page_id, "failed", error_message=str(e))
+            pages.append({"id": page_id, "url": page_url, "status": "failed", "summary": None})
+            return []
+
+        with stage("normalize"):
+            findings = merge_viewports(findings)
+            summary = summarize_findings(findings)
+        with stage("persist"):
+            if not await asyncio.to_thread(ScanRepo.add_findings, scan_id, findings, worker_id):
+                raise LeaseLost(scan_id)
+            await asyncio.to_thread(ScanRepo.finish_page, page_id, "done", summary=summary)
+        pages.append({"id": page_id, "url": page_url, "status": "done", "summary": summary})
+        all_findings.extend(findings)
+        return [link for link in links if _crawlable(link, seed)]
+
+    started = 0
+    active = 0
+    cond = asyncio.Condition()
+
+    async def crawl_worker():
+        nonlocal started, active
+        while True:
+            async with cond:
+                while True:
+                    if started >= max_pages:
+                        return
+                    item = frontier.pop()
+                    if item is not None:
+                        break
+                    if active == 0:
+                        # Frontier empty and nobody left who could add to it
+                        return
+                    await cond.wait()
+                started += 1
+                active += 1
+
+            page_url, depth = item
+            links: list[str] = []
+            try:
+                links = await audit(page_url, depth)
+            finally:
+                async with cond:
+                    active -= 1
+                    for link in links:
+                        frontier.push(link, depth + 1)
+                    cond.notify_all()
+
+    workers = [asyncio.create_task(crawl_worker()) for _ in range(max(1, settings.crawl_concurrency))]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        # A failing worker (e.g. LeaseLost) must not leave its siblings crawling
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    if not any(p["status"] == "done" for p in pages):
+        failed = await asyncio.to_thread(
+            ScanRepo.set_scan_failed, scan_id, robots_allowed="yes" if allowed else "no",
+            error_message="No page of the site could be audited", worker_id=worker_id,
+        )
+        if not failed:
+            raise LeaseLost(scan_id)
+        return
+
+    summary = summarize_site(pages, all_findings)
+    summary["pages"]["frontier_dropped"] = frontier.dropped
+    summary["pages"]["frontier_rejected"] = frontier.rejected
+
+    stats = {"screenshots": screenshot_stats(list(screenshots.values())), "network": network_summary(network)}
+    with stage("persist"):
+        await asyncio.to_thread(
+            ArtifactRepo.set_refs, scan_id, SCREENSHOT_KINDS + (AXE_RAW_KIND,), screenshot_refs(screenshots) + raw_refs
+        )
+        done = await asyncio.to_thread(
+            ScanRepo.set_scan_done, scan_id, robots_allowed=allowed, summary=summary, screenshots=screenshots, stats=stats,
+            worker_id=worker_id,
+        )
+        if not done:
+            raise LeaseLost(scan_id)
+    if settings.report_mode == "inline":
+        await asyncio.to_thread(render_report, scan_id)
@@ -0,0 +1,101 @@
+import io
+from PIL import Image
+from app.config import settings
+from app.core.artifacts import put_bytes
+
+# Pillow format name and file extension per SCREENSHOT_FORMAT
+FORMATS = {
+    "png": ("PNG", ".png"),
+    "jpeg": ("JPEG", ".jpg"),
+    "webp": ("WEBP", ".webp"),
+}
+# Artifact kinds written by process_screenshot
+SCREENSHOT_KINDS = ("screenshot", "thumbnail")
+# WebP cannot encode images taller/wider than this
+WEBP_MAX_DIMENSION = 16383
+
+
+def _encode(img: Image.Image, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    if fmt == "PNG":
+        img.save(buf, fmt, optimize=True)
+    elif fmt == "JPEG":
+        img.convert("RGB").save(buf, fmt, quality=settings.screenshot_quality, optimize=True, progressive=True)
+    else:
+        img.save(buf, fmt, quality=settings.screenshot_quality, method=4)
+    return buf.getvalue()
+
+
+def process_screenshot(png: bytes) -> dict:
+    """Store a raw full-page PNG capture in the configured format, plus a thumbnail.
+
+    Images go to the content-addressed store, so an unchanged page is stored
+    once however often it is scanned. Pages taller than SCREENSHOT_TILE_HEIGHT
+    are split into tiles. Returns paths and sizes: `path` is the (first) image,
+    `tiles` all stored images, `thumbnail` the downscaled JPEG used by the PDF
+    and the UI, `artifacts` the stored blobs to reference from the scan.
+    """
+    fmt, ext = FORMATS[settings.screenshot_format]
+
+    img = Image.open(io.BytesIO(png))
+    img.load()
+    width, height = img.size
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGB")
+
+    tile_h = settings.screenshot_tile_height
+    if fmt == "WEBP":
+        tile_h = min(tile_h or WEBP_MAX_DIMENSION, WEBP_MAX_DIMENSION)
+    artifacts: list[dict] = []
+    if tile_h and height > tile_h:
+        for top in range(0, height, tile_h):
+            data = _encode(img.crop((0, top, width, min(top + tile_h, height))), fmt)
+            artifacts.append({**put_bytes(data, ext), "kind": "screenshot"})
+    else:
+        artifacts.append({**put_bytes(_encode(img, fmt), ext), "kind": "screenshot"})
+
+    # Thumbnail: the top of the page, downscaled to THUMBNAIL_WIDTH
+    thumb_w = min(settings.thumbnail_width, width)
+    crop_h = min(height, round(settings.thumbnail_max_height * width / thumb_w))
+    thumb = img.crop((0, 0, width, crop_h))
+    thumb.thumbnail((thumb_w, settings.thumbnail_max_height), Image.Resampling.LANCZOS)
+    thumbnail = {**put_bytes(_encode(thumb, "JPEG"), ".jpg"), "kind": "thumbnail"}
+    artifacts.append(thumbnail)
+
+    tiles = [a["path"] for a in artifacts if a["kind"] == "screenshot"]
+    return {
+        "path": tiles[0],
+        "tiles": tiles,
+        "thumbnail": thumbnail["path"],
+        "width": width,
+        "height": height,
+        "raw_bytes": len(png),
+        "stored_bytes": sum(a["size"] for a in artifacts),
+        "deduplicated_bytes": sum(a["size"] for a in artifacts if not a["new"]),
+        "artifacts": [{"sha256": a["sha256"], "path": a["path"], "size": a["size"], "kind": a["kind"]} for a in artifacts],
+    }
+
+
+def screenshot_stats(shots: list[dict]) -> dict:
+    """Bytes saved by the image pipeline across a scan's screenshots."""
+    raw = sum(s.get("raw_bytes", 0) for s in shots)
+    stored = sum(s.get("stored_bytes", 0) for s in shots)
+    # Already in the artifact store from an earlier scan: not written again
+    deduplicated = sum(s.get("deduplicated_bytes", 0) for s in shots)
+    return {
+        "count": len(shots),
+        "raw_bytes": raw,
+        "stored_bytes": stored,
+        "saved_bytes": raw - stored,
+        "deduplicated_bytes": deduplicated,
+        "format": settings.screenshot_format,
+    }
+
+
+def screenshot_refs(screenshots: dict[str, dict]) -> list[dict]:
+    """Artifact references for a scan's screenshots, and drop them from the stored map."""
+    refs = []
+    for name, shot in screenshots.items():
+        for a in shot.pop("artifacts", []):
+            refs.append({**a, "name": name})
+    return refs
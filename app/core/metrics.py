@@ -0,0 +1,93 @@
+from datetime import datetime
+from app.config import settings
+from app.db.repo import MetricsRepo, RobotsCacheRepo
+from app.core.timing import STAGE_BUCKETS
+# Recorded by the worker when it claims a scan; exported as the claim latency
+QUEUE_WAIT_STAGE = "queue_wait"
+# Worker rows without a heartbeat for this long are left out (and pruned by maintenance)
+WORKER_STATS_MAX_AGE_SECONDS = 86400
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(v: float) -> str:
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Writer:
+    def __init__(self):
+        self.lines: list[str] = []
+
+    def family(self, name: str, kind: str, help_text: str):
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name: str, value: float, **labels):
+        self.lines.append(f"{name}{_labels(**labels)} {_number(value)}")
+
+    def histogram(self, name: str, hist: dict, **labels):
+        for bound, count in hist["buckets"]:
+            self.sample(f"{name}_bucket", count, **labels, le=_number(bound))
+        self.sample(f"{name}_bucket", hist["count"], **labels, le="+Inf")
+        self.sample(f"{name}_sum", round(hist["sum"], 4), **labels)
+        self.sample(f"{name}_count", hist["count"], **labels)
+
+
+def render_metrics() -> str:
+    """Prometheus text exposition, computed from the database.
+
+    Everything comes from the database so the API process can report on all
+    workers; stage histograms are running totals kept as timings are saved.
+    """
+    w = _Writer()
+    hists = MetricsRepo.stage_histograms(STAGE_BUCKETS)
+
+    w.family("bfsg_scan_stage_seconds", "histogram", "Time a scan spent in each pipeline stage (summed over viewports/pages).")
+    for stage, hist in hists.items():
+        if stage != QUEUE_WAIT_STAGE:
+            w.histogram("bfsg_scan_stage_seconds", hist, stage=stage)
+
+    w.family("bfsg_scan_claim_latency_seconds", "histogram", "Time from enqueueing a scan to a worker claiming it.")
+    if QUEUE_WAIT_STAGE in hists:
+        w.histogram("bfsg_scan_claim_latency_seconds", hists[QUEUE_WAIT_STAGE])
+
+    counts = MetricsRepo.scan_counts()
+    w.family("bfsg_queue_depth", "gauge", "Scans waiting to be claimed.")
+    w.sample("bfsg_queue_depth", sum(n for (status, _), n in counts.items() if status == "queued"))
+    w.family("bfsg_queue_oldest_age_seconds", "gauge", "Age of the oldest queued scan.")
+    w.sample("bfsg_queue_oldest_age_seconds", round(MetricsRepo.oldest_queued_age(), 3))
+    w.family("bfsg_scans", "gauge", "Scans in the database by status (outcome) and type.")
+    for (status, scan_type), n in sorted(counts.items()):
+        w.sample("bfsg_scans", n, status=status, type=scan_type)
+
+    workers = MetricsRepo.workers(WORKER_STATS_MAX_AGE_SECONDS)
+    now = datetime.utcnow()
+    w.family("bfsg_worker_up", "gauge", "1 if the worker heartbeated within JOB_LEASE_SECONDS.")
+    for wk in workers:
+        w.sample("bfsg_worker_up", int((now - wk["heartbeat_at"]).total_seconds() <= settings.job_lease_seconds), worker=wk["worker_id"])
+    w.family("bfsg_worker_in_flight", "gauge", "Scans a worker is running or has claimed.")
+    for wk in workers:
+        w.sample("bfsg_worker_in_flight", wk["in_flight"], worker=wk["worker_id"])
+    w.family("bfsg_worker_scans_total", "counter", "Scans a worker process ran, by whether the job raised.")
+    for wk in workers:
+        w.sample("bfsg_worker_scans_total", wk["scans_finished"], worker=wk["worker_id"], outcome="finished")
+        w.sample("bfsg_worker_scans_total", wk["scans_errored"], worker=wk["worker_id"], outcome="errored")
+    w.family("bfsg_browser_launches_total", "counter", "Chromium launches by a worker's browser pool (incl. recycling and crashes).")
+    for wk in workers:
+        w.sample("bfsg_browser_launches_total", wk["browser_launches"], worker=wk["worker_id"])
+
+    robots = RobotsCacheRepo.stats()
+    w.family("bfsg_robots_lookups_total", "counter", "robots.txt lookups answered from the DB cache or by a request (in-memory hits not included).")
+    w.sample("bfsg_robots_lookups_total", robots["hits"], result="cache_hit")
+    w.sample("bfsg_robots_lookups_total", robots["fetches"], result="fetched")
+    w.sample("bfsg_robots_lookups_total", robots["revalidations"], result="revalidated")
+    w.sample("bfsg_robots_lookups_total", robots["errors"], result="error")
+    return "\n".join(w.lines) + "\n"
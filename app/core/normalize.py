@@ -1,7 +1,29 @@
+import hashlib
+import re
+from app.config import settings
 from app.domain.severity import impact_to_severity
 from app.domain.hints import enrich
 
-def normalize_axe_results(raw: dict, viewport_name: str, screenshot_path: str | None = None) -> list[dict]:
+_WS = re.compile(r"\s+")
+
+def finding_fingerprint(rule_id: str, selector: str | None, html: str | None, page_url: str | None = None) -> str:
+    """Identifies the same issue on the same element across viewports and scans.
+
+    Rule, whitespace-normalized selector and a hash of the trimmed HTML; crawl
+    findings also include the page URL so shared layout issues stay per page.
+    """
+    sel = _WS.sub(" ", selector or "").strip()
+    html_hash = hashlib.sha1(_WS.sub(" ", html or "").strip().encode("utf-8")).hexdigest()
+    raw = "|".join((rule_id or "", sel, html_hash, page_url or ""))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+def normalize_axe_results(
+    raw: dict,
+    viewport_name: str,
+    screenshot_path: str | None = None,
+    page_id: int | None = None,
+    page_url: str | None = None,
+) -> list[dict]:
     findings: list[dict] = []
     violations = raw.get("violations", []) if isinstance(raw, dict) else []
     for v in violations:
@@ -13,14 +35,17 @@ def normalize_axe_results(raw: dict, viewport_name: str, screenshot_path: str |
         hint = enrich(rule_id)
 
         nodes = v.get("nodes", []) or []
-        # Create one finding per node (more actionable); cap to avoid huge output
-        for node in nodes[:30]:
+        # Create one finding per node (more actionable); cap to avoid huge output.
+        # The full list is kept in the raw axe archive.
+        for node in nodes[:settings.normalize_max_nodes]:
             selector = None
             targets = node.get("target")
             if isinstance(targets, list) and targets:
                 selector = " ".join(str(t) for t in targets[:2])
             html = node.get("html")
             findings.append({
+                "fingerprint": finding_fingerprint(rule_id, selector, html, page_url),
+                "page_id": page_id,
                 "viewport": viewport_name,
                 "rule_id": rule_id,
                 "impact": impact_to_severity(impact),
@@ -35,6 +60,26 @@ def normalize_axe_results(raw: dict, viewport_name: str, screenshot_path: str |
             })
     return findings
 
+def merge_viewports(findings: list[dict]) -> list[dict]:
+    """Collapse findings with the same fingerprint into one row.
+
+    `viewport` becomes a comma-separated set ("desktop,mobile") in first-seen
+    order; the other fields come from the first occurrence.
+    """
+    merged: dict[str, dict] = {}
+    for f in findings:
+        fp = f.get("fingerprint")
+        first = merged.get(fp) if fp else None
+        if first is None:
+            merged[fp or id(f)] = dict(f)
+            continue
+        seen = first["viewport"].split(",")
+        for vp in f["viewport"].split(","):
+            if vp not in seen:
+                seen.append(vp)
+        first["viewport"] = ",".join(seen)
+    return list(merged.values())
+
 def summarize_findings(findings: list[dict]) -> dict:
     counts = {"critical": 0, "serious": 0, "moderate": 0, "minor": 0}
     for f in findings:
@@ -44,3 +89,30 @@ def summarize_findings(findings: list[dict]) -> dict:
         counts[sev] += 1
     total = sum(counts.values())
     return {"total": total, **counts}
+
+def summarize_site(pages: list[dict], findings: list[dict], top_n: int = 10) -> dict:
+    """Site-level summary for crawl scans.
+
+    `pages` items carry url/status and the page's own summary (if audited).
+    """
+    summary = summarize_findings(findings)
+
+    statuses: dict[str, int] = {}
+    for p in pages:
+        statuses[p["status"]] = statuses.get(p["status"], 0) + 1
+
+    rule_counts: dict[str, int] = {}
+    rule_pages: dict[str, set] = {}
+    for f in findings:
+        rule = f.get("rule_id") or "unknown"
+        rule_counts[rule] = rule_counts.get(rule, 0) + 1
+        rule_pages.setdefault(rule, set()).add(f.get("page_id"))
+    top_rules = sorted(rule_counts, key=lambda r: rule_counts[r], reverse=True)[:top_n]
+
+    audited = [p for p in pages if p.get("summary")]
+    worst = sorted(audited, key=lambda p: p["summary"].get("total", 0), reverse=True)[:top_n]
+
+    summary["pages"] = {"total": len(pages), **statuses, "with_issues": sum(1 for p in audited if p["summary"].get("total"))}
+    summary["top_rules"] = [{"rule_id": r, "count": rule_counts[r], "pages": len(rule_pages[r])} for r in top_rules]
+    summary["worst_pages"] = [{"url": p["url"], "total": p["summary"].get("total", 0)} for p in worst]
+    return summary
@@ -0,0 +1,40 @@
+import asyncio
+from app.config import settings
+from app.core.robots import crawl_delay
+from app.core.urls import host_of
+from app.db.repo import HostLimitRepo
+
+
+def host_interval(url: str) -> tuple[float, int]:
+    """Seconds between page loads on url's host, and the burst allowed on top.
+
+    HOST_RATE_PER_MINUTE sets the pace; a robots.txt Crawl-delay (capped at
+    CRAWL_DELAY_MAX_SECONDS) can only slow it down, and then allows no burst.
+    """
+    interval = 60.0 / settings.host_rate_per_minute if settings.host_rate_per_minute > 0 else 0.0
+    burst = settings.host_burst
+    if settings.respect_crawl_delay:
+        delay = min(crawl_delay(url) or 0.0, settings.crawl_delay_max_seconds)
+        if delay > interval:
+            interval, burst = delay, 1
+    return interval, burst
+
+
+async def wait_for_host(url: str) -> float:
+    """Block until the host's shared rate limit allows another page load; returns seconds waited."""
+    if settings.har_mode == "replay":
+        return 0.0
+    host = host_of(url)
+    if not host:
+        return 0.0
+    interval, burst = await asyncio.to_thread(host_interval, url)
+    if interval <= 0:
+        return 0.0
+    waited = 0.0
+    while True:
+        wait = await asyncio.to_thread(HostLimitRepo.acquire, host, interval, burst)
+        if wait <= 0:
+            return waited
+        # Other workers may take the next token first; retry after sleeping
+        await asyncio.sleep(wait)
+        waited += wait
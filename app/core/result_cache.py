@@ -0,0 +1,22 @@
+import hashlib
+from app.config import settings
+from app.core.urls import canonicalize_url
+from app.scanners.axe_runner import axe_fingerprint
+from app.scanners.interception import interception_fingerprint
+
+# Bump when normalization or hints change, so cached findings are not reused
+RESULT_CACHE_VERSION = 1
+
+
+def cache_key(url: str, viewport: dict, dom_hash: str) -> str:
+    """Findings depend only on the page state, the viewport, and the axe build and ruleset."""
+    parts = [
+        f"{RESULT_CACHE_VERSION}:{settings.normalize_max_nodes}",
+        canonicalize_url(url),
+        f"{viewport['name']}:{viewport['width']}x{viewport['height']}",
+        dom_hash,
+        axe_fingerprint(),
+        # Blocked resources can change what is rendered and hence the findings
+        interception_fingerprint(),
+    ]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
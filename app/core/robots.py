@@ -1,8 +1,110 @@
+import threading
+import time
+from datetime import datetime, timedelta
 from urllib.parse import urlparse
 from urllib.robotparser import RobotFileParser
 import requests
 
 from app.config import settings
+from app.db.repo import RobotsCacheRepo
+
+# Parsed robots.txt per origin for this process: origin -> (parser, expires_monotonic)
+_parsers: dict[str, tuple[RobotFileParser, float]] = {}
+_lock = threading.Lock()
+
+CACHE_STATS = {"memory_hits": 0, "db_hits": 0, "revalidated": 0, "fetched": 0, "errors": 0}
+
+
+def cache_stats() -> dict:
+    """Lookups by this process, including in-memory hits (the shared totals are RobotsCacheRepo.stats())."""
+    return dict(CACHE_STATS)
+
+
+def _parse(body: str | None) -> RobotFileParser:
+    rp = RobotFileParser()
+    # An empty file allows everything (missing robots.txt / fetch errors)
+    rp.parse((body or "").splitlines())
+    return rp
+
+
+def _failed(cached: dict | None, now: datetime, status_code: int | None) -> dict:
+    """Row to store after a network error or 5xx: retried sooner, keeping a good body we already have."""
+    expires = now + timedelta(seconds=settings.robots_error_ttl_seconds)
+    if cached and cached["status"] == "ok":
+        # A blip must not turn a site's Disallow rules into allow-all
+        kept = {k: cached[k] for k in ("status", "status_code", "body", "etag", "last_modified", "fetched_at")}
+        return {**kept, "expires_at": expires, "last_error_at": now}
+    return {"status": "error", "status_code": status_code, "body": None, "etag": None, "last_modified": None,
+            "fetched_at": now, "expires_at": expires, "last_error_at": now}
+
+
+def _fetch(origin: str, cached: dict | None) -> tuple[dict, str]:
+    """Fetch robots.txt, conditionally if we have validators.
+
+    Returns the row to store and the RobotsCache counter it counts towards.
+    """
+    robots_url = f"{origin}/robots.txt"
+    headers = {"User-Agent": settings.user_agent}
+    if cached and cached["status"] == "ok":
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    now = datetime.utcnow()
+    ttl = timedelta(seconds=settings.robots_cache_ttl_seconds)
+    try:
+        # RobotFileParser.read() uses urllib; we use requests for more control
+        resp = requests.get(robots_url, timeout=10, headers=headers)
+    except Exception:
+        # Network/timeout fetching robots: default allow (common behavior), retry sooner
+        CACHE_STATS["errors"] += 1
+        return _failed(cached, now, None), "errors"
+
+    if resp.status_code == 304 and cached:
+        CACHE_STATS["revalidated"] += 1
+        return {**{k: cached[k] for k in ("status", "status_code", "body", "etag", "last_modified")},
+                "fetched_at": now, "expires_at": now + ttl}, "revalidations"
+
+    if resp.status_code >= 500:
+        CACHE_STATS["errors"] += 1
+        return _failed(cached, now, resp.status_code), "errors"
+
+    CACHE_STATS["fetched"] += 1
+    if resp.status_code >= 400:
+        # If robots.txt missing, generally treat as allowed
+        return {"status": "missing", "status_code": resp.status_code, "body": None, "etag": None,
+                "last_modified": None, "fetched_at": now, "expires_at": now + ttl}, "fetches"
+
+    return {"status": "ok", "status_code": resp.status_code, "body": resp.text,
+            "etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified"),
+            "fetched_at": now, "expires_at": now + ttl}, "fetches"
+
+
+def get_parser(origin: str) -> RobotFileParser:
+    """Parsed robots.txt for an origin: process memory, then the shared DB cache, then the network."""
+    with _lock:
+        entry = _parsers.get(origin)
+        if entry and entry[1] > time.monotonic():
+            CACHE_STATS["memory_hits"] += 1
+            return entry[0]
+
+    cached = RobotsCacheRepo.get(origin)
+    now = datetime.utcnow()
+    if cached and cached["expires_at"] > now:
+        CACHE_STATS["db_hits"] += 1
+        RobotsCacheRepo.record_hit(origin)
+        row = cached
+    else:
+        row, outcome = _fetch(origin, cached)
+        RobotsCacheRepo.upsert(origin, outcome, **row)
+
+    rp = _parse(row["body"])
+    remaining = (row["expires_at"] - now).total_seconds()
+    with _lock:
+        _parsers[origin] = (rp, time.monotonic() + max(0.0, remaining))
+    return rp
+
 
 def is_allowed(url: str) -> tuple[bool, str]:
     """Return (allowed, robots_url_or_reason)."""
@@ -10,24 +112,31 @@ def is_allowed(url: str) -> tuple[bool, str]:
     if not parsed.scheme.startswith("http"):
         return False, "Invalid URL scheme"
 
-    robots_url = f"{parsed.scheme}://{parsed.netloc}/robots.txt"
-    rp = RobotFileParser()
-    rp.set_url(robots_url)
+    if settings.har_mode == "replay":
+        # Replayed scans never touch the site; robots.txt was honoured when recording
+        return True, "HAR replay"
 
-    try:
-        # RobotFileParser.read() uses urllib; we use requests for more control
-        resp = requests.get(robots_url, timeout=10, headers={"User-Agent": settings.user_agent})
-        if resp.status_code >= 400:
-            # If robots.txt missing, generally treat as allowed
-            rp.parse([])
-            return True, robots_url
-        rp.parse(resp.text.splitlines())
-    except Exception:
-        # Network/timeout fetching robots: default allow (common behavior)
-        return True, robots_url
+    origin = f"{parsed.scheme}://{parsed.netloc}"
+    robots_url = f"{origin}/robots.txt"
+    rp = get_parser(origin)
 
     ua = settings.robots_user_agent or "*"
     try:
         return bool(rp.can_fetch(ua, url)), robots_url
     except Exception:
         return True, robots_url
+
+
+def crawl_delay(url: str) -> float | None:
+    """Crawl-delay (seconds) robots.txt asks of our user-agent, if any."""
+    if settings.har_mode == "replay":
+        return None
+    parsed = urlparse(url)
+    if not parsed.scheme.startswith("http"):
+        return None
+    rp = get_parser(f"{parsed.scheme}://{parsed.netloc}")
+    try:
+        delay = rp.crawl_delay(settings.robots_user_agent or "*")
+    except Exception:
+        return None
+    return float(delay) if delay else None
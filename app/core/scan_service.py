@@ -1,63 +1,178 @@
 import asyncio
 from datetime import datetime
 from app.config import settings
-from app.db.repo import ScanRepo
+from app.db.repo import ScanRepo, ArtifactRepo, ResultCacheRepo, LeaseLost
 from app.core.robots import is_allowed
-from app.core.storage import ensure_dirs
+from app.core.crawl_service import run_crawl_job_async
 from app.domain.viewports import get_viewports
 from app.scanners.playwright_runner import open_and_capture
 from app.scanners.axe_runner import run_axe
-from app.core.normalize import normalize_axe_results, summarize_findings
-from app.reports.pdf import build_pdf
+from app.scanners.page_scan import scan_page
+from app.core.normalize import normalize_axe_results, summarize_findings, merge_viewports
+from app.core.images import screenshot_stats, screenshot_refs, SCREENSHOT_KINDS
+from app.core.result_cache import cache_key
+from app.core.axe_archive import archive_raw, AXE_RAW_KIND
+from app.reports.service import render_report
+from app.scanners.browser_pool import BrowserPool
+from app.scanners.interception import new_network_stats, network_summary
+from app.core.timing import StageTimer, stage
 
-def run_scan_job(scan_id: int):
-    scan = ScanRepo.get_scan(scan_id)
+# Artifacts a page scan references: screenshots and the raw axe output per viewport
+SCAN_ARTIFACT_KINDS = SCREENSHOT_KINDS + (AXE_RAW_KIND,)
+
+async def _scan_viewport(
+    url: str, vp: dict, pool: BrowserPool, limit: asyncio.Semaphore, use_cache: bool, network: dict,
+) -> dict:
+    name = vp["name"]
+    async with limit:
+        if settings.scan_two_pass:
+            # Isolated passes: separate page loads for screenshot and axe
+            shot = (await open_and_capture(url, vp, pool=pool, network_stats=network))["screenshot"]
+            raw = await run_axe(url, vp, pool=pool, network_stats=network)
+            with stage("normalize"):
+                findings = normalize_axe_results(raw, viewport_name=name, screenshot_path=shot["path"])
+            with stage("archive"):
+                raw_ref = await asyncio.to_thread(archive_raw, raw, name)
+            return {"findings": findings, "screenshot": shot, "refs": screenshot_refs({name: shot}) + [raw_ref], "cache": None}
+
+        key = None
+        cached = None
+
+        async def reuse(dom_hash: str) -> bool:
+            nonlocal key, cached
+            key = cache_key(url, vp, dom_hash)
+            if use_cache:
+                with stage("cache_lookup"):
+                    cached = await asyncio.to_thread(ResultCacheRepo.get, key)
+            return cached is not None
+
+        res = await scan_page(url, vp, pool=pool, reuse=reuse, network_stats=network)
+
+    entry = {"key": key, "url": url, "viewport": name, "hit": cached is not None}
+    if cached:
+        # Unchanged page: take findings and screenshots from the scan that produced them
+        src = cached["scan_id"]
+        with stage("cache_lookup"):
+            findings = await asyncio.to_thread(ScanRepo.viewport_findings, src, name)
+            refs = await asyncio.to_thread(ArtifactRepo.viewport_refs, src, name, SCAN_ARTIFACT_KINDS)
+        return {"findings": findings, "screenshot": cached["screenshots"].get(name), "refs": refs, "cache": entry}
+
+    shot = res["screenshot"]
+    with stage("normalize"):
+        findings = normalize_axe_results(res["axe"], viewport_name=name, screenshot_path=shot["path"])
+    with stage("archive"):
+        raw_ref = await asyncio.to_thread(archive_raw, res["axe"], name)
+    return {"findings": findings, "screenshot": shot, "refs": screenshot_refs({name: shot}) + [raw_ref], "cache": entry}
+
+async def run_scan_job_async(scan_id: int, pool: BrowserPool, worker_id: str | None = None):
+    """Run a claimed scan; its per-stage timings are stored with it, also when it fails.
+
+    With a worker_id, results are only written while that worker holds the
+    scan's lease; otherwise LeaseLost is raised and the results are dropped.
+    """
+    scan = await asyncio.to_thread(ScanRepo.get_scan, scan_id)
     if not scan:
         raise RuntimeError("Scan not found")
 
+    timer = StageTimer()
+    if scan.get("created_at") and scan.get("started_at"):
+        queued = datetime.fromisoformat(scan["started_at"]) - datetime.fromisoformat(scan["created_at"])
+        timer.add("queue_wait", max(0.0, queued.total_seconds()))
+    try:
+        with timer.activate(), timer.stage("total"):
+            if scan.get("scan_type") == "crawl":
+                await run_crawl_job_async(scan_id, scan, pool, worker_id)
+            else:
+                await _run_page_scan(scan_id, scan, pool, worker_id)
+    finally:
+        await asyncio.to_thread(ScanRepo.save_timings, scan_id, timer.as_dict())
+
+async def _run_page_scan(scan_id: int, scan: dict, pool: BrowserPool, worker_id: str | None):
+    # DB, robots and PDF work is blocking; keep it off the event loop so other
+    # viewports (and other scans in the same worker) keep making progress.
     url = scan["url"]
 
-    allowed, robots_info = is_allowed(url)
+    with stage("robots"):
+        allowed, robots_info = await asyncio.to_thread(is_allowed, url)
     if not allowed and settings.allow_robots_deny:
-        ScanRepo.set_scan_failed(scan_id, robots_allowed="no", error_message=f"Blocked by robots.txt: {robots_info}")
+        failed = await asyncio.to_thread(
+            ScanRepo.set_scan_failed, scan_id, robots_allowed="no", error_message=f"Blocked by robots.txt: {robots_info}",
+            worker_id=worker_id,
+        )
+        if not failed:
+            raise LeaseLost(scan_id)
         return
 
-    dirs = ensure_dirs(scan_id)
     viewports = get_viewports()
+    # Replays exist to be timed and compared, so they always run axe
+    use_cache = settings.result_cache and not scan.get("force_refresh") and settings.har_mode != "replay"
 
-    screenshots = {}
+    # Viewports are independent: run them concurrently in separate contexts,
+    # capped per scan so very heavy pages don't exhaust the browser's memory.
+    limit = asyncio.Semaphore(max(1, settings.scan_viewport_concurrency))
+    network = new_network_stats()
+    results = await asyncio.gather(
+        *(_scan_viewport(url, vp, pool, limit, use_cache, network) for vp in viewports),
+        return_exceptions=True,
+    )
     all_findings: list[dict] = []
+    screenshots: dict[str, dict] = {}
+    refs: list[dict] = []
+    entries: list[dict] = []
+    for vp, res in zip(viewports, results):
+        if isinstance(res, BaseException):
+            raise res
+        all_findings.extend(res["findings"])
+        if res["screenshot"]:
+            screenshots[vp["name"]] = res["screenshot"]
+        refs.extend(res["refs"])
+        if res["cache"]:
+            entries.append(res["cache"])
 
-    # For simplicity we open the page twice per viewport (once for screenshot, once for axe).
-    # This keeps logic straightforward and reduces shared-state bugs.
-    for vp in viewports:
-        vp_name = vp["name"]
-        screenshot_path = f"{dirs['screenshots_dir']}/{vp_name}.png"
-        screenshots[vp_name] = screenshot_path
+    # The same issue seen on desktop and mobile is one finding
+    with stage("normalize"):
+        all_findings = merge_viewports(all_findings)
+        summary = summarize_findings(all_findings)
 
-        # Screenshot
-        asyncio.run(open_and_capture(url, vp, screenshot_path))
+    # Persist findings
+    with stage("persist"):
+        if not await asyncio.to_thread(ScanRepo.replace_findings, scan_id, all_findings, worker_id):
+            raise LeaseLost(scan_id)
 
-        # Axe scan
-        raw = asyncio.run(run_axe(url, vp))
-        findings = normalize_axe_results(raw, viewport_name=vp_name, screenshot_path=screenshot_path)
-        all_findings.extend(findings)
+    hits = sum(1 for e in entries if e["hit"])
+    fresh = [screenshots[e["viewport"]] for e in entries if not e["hit"] and e["viewport"] in screenshots]
+    stats = {
+        "screenshots": screenshot_stats(fresh if entries else list(screenshots.values())),
+        "cache": {"hits": hits, "misses": len(entries) - hits},
+        "network": network_summary(network),
+    }
+    cache_status = None
+    if entries:
+        if not use_cache:
+            cache_status = "bypass"
+        else:
+            cache_status = "hit" if hits == len(viewports) else "partial" if hits else "miss"
 
-    summary = summarize_findings(all_findings)
+    with stage("persist"):
+        await asyncio.to_thread(ArtifactRepo.set_refs, scan_id, SCAN_ARTIFACT_KINDS, refs)
+        done = await asyncio.to_thread(
+            ScanRepo.set_scan_done, scan_id, robots_allowed=allowed, summary=summary, screenshots=screenshots,
+            stats=stats, cache_status=cache_status, worker_id=worker_id,
+        )
+        if not done:
+            raise LeaseLost(scan_id)
+        # This scan is now the freshest source for its page states
+        await asyncio.to_thread(ResultCacheRepo.put, entries, scan_id)
+    if settings.report_mode == "inline":
+        await asyncio.to_thread(render_report, scan_id)
 
-    # Persist findings
-    ScanRepo.replace_findings(scan_id, all_findings)
-
-    # Build PDF
-    report_pdf_path = f"{dirs['reports_dir']}/report.pdf"
-    build_pdf(
-        out_path=report_pdf_path,
-        scan_id=scan_id,
-        url=url,
-        robots_allowed=allowed,
-        summary=summary,
-        findings=all_findings,
-        screenshots=screenshots,
-    )
+def run_scan_job(scan_id: int):
+    """Run one scan outside the worker, with a short-lived single-browser pool."""
+    async def _run():
+        pool = BrowserPool(size=1, max_contexts=0, max_memory_mb=0)
+        try:
+            await run_scan_job_async(scan_id, pool)
+        finally:
+            await pool.close()
 
-    ScanRepo.set_scan_done(scan_id, robots_allowed=allowed, summary=summary, report_pdf_path=report_pdf_path)
+    asyncio.run(_run())
@@ -0,0 +1,60 @@
+import gzip
+import xml.etree.ElementTree as ET
+from urllib.parse import urlparse
+import requests
+
+from app.config import settings
+
+MAX_SITEMAP_FILES = 10
+
+
+def _fetch(url: str) -> bytes | None:
+    try:
+        resp = requests.get(url, timeout=10, headers={"User-Agent": settings.user_agent})
+    except Exception:
+        return None
+    if resp.status_code >= 400:
+        return None
+    body = resp.content
+    if url.endswith(".gz") or body[:2] == b"\x1f\x8b":
+        try:
+            body = gzip.decompress(body)
+        except OSError:
+            return None
+    return body
+
+
+def _locs(root: ET.Element, tag: str) -> list[str]:
+    # Sitemaps are namespaced; match on local names only
+    out = []
+    for el in root.iter():
+        if el.tag.rsplit("}", 1)[-1] != tag:
+            continue
+        for child in el:
+            if child.tag.rsplit("}", 1)[-1] == "loc" and child.text:
+                out.append(child.text.strip())
+    return out
+
+
+def fetch_sitemap_urls(seed_url: str, limit: int) -> list[str]:
+    """Page URLs from the site's /sitemap.xml (following sitemap indexes), at most `limit`."""
+    parsed = urlparse(seed_url)
+    todo = [f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"]
+    seen_files: set[str] = set()
+    urls: list[str] = []
+
+    while todo and len(seen_files) < MAX_SITEMAP_FILES and len(urls) < limit:
+        sm_url = todo.pop(0)
+        if sm_url in seen_files:
+            continue
+        seen_files.add(sm_url)
+        body = _fetch(sm_url)
+        if not body:
+            continue
+        try:
+            root = ET.fromstring(body)
+        except ET.ParseError:
+            continue
+        todo.extend(_locs(root, "sitemap"))
+        urls.extend(_locs(root, "url"))
+    return urls[:limit]
@@ -0,0 +1,60 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current: ContextVar["StageTimer | None"] = ContextVar("stage_timer", default=None)
+
+# Upper bounds (seconds) of the /metrics stage histogram buckets
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def bucket_bound(seconds: float) -> float:
+    """Upper bound of the histogram bucket seconds falls in (inf past the last one)."""
+    return next((b for b in STAGE_BUCKETS if seconds <= b), float("inf"))
+
+
+class StageTimer:
+    """Seconds spent per pipeline stage of one scan.
+
+    Stages of viewports or pages that run concurrently add up, so a stage can
+    exceed the scan's wall time ("total").
+    """
+
+    def __init__(self):
+        self.stages: dict[str, list[float]] = {}  # stage -> [seconds, calls]
+
+    def add(self, name: str, seconds: float):
+        entry = self.stages.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0)
+
+    @contextmanager
+    def activate(self):
+        """Make this the timer that stage() reports to, in this task and the ones it starts."""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def as_dict(self) -> dict[str, dict]:
+        return {name: {"seconds": round(s, 4), "calls": n} for name, (s, n) in self.stages.items()}
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block into the running scan's StageTimer (no-op outside a scan)."""
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    with timer.stage(name):
+        yield
@@ -0,0 +1,69 @@
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import posixpath
+from pydantic import HttpUrl, TypeAdapter, ValidationError
+
+# Query parameters that never change page content
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "mc_cid", "mc_eid", "_ga", "yclid"}
+DEFAULT_PORTS = {"http": 80, "https": 443}
+_HTTP_URL = TypeAdapter(HttpUrl)
+
+
+def canonicalize_url(url: str) -> str:
+    """Normalise a URL so equivalent spellings compare equal.
+
+    Lowercases scheme/host, drops default ports, fragments and tracking parameters,
+    resolves dot segments and sorts the query string.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    netloc = host if port is None or DEFAULT_PORTS.get(scheme) == port else f"{host}:{port}"
+
+    path = parts.path or "/"
+    trailing = path.endswith("/")
+    path = posixpath.normpath("/" + path.lstrip("/"))
+    if trailing and not path.endswith("/"):
+        path += "/"
+
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ]
+    return urlunsplit((scheme, netloc, path, urlencode(sorted(query)), ""))
+
+
+def host_of(url: str) -> str:
+    return (urlsplit(url).hostname or "").lower()
+
+
+def same_site(url: str, seed_url: str) -> bool:
+    """True if url is on the seed's host (a leading 'www.' is ignored)."""
+    a, b = host_of(url), host_of(seed_url)
+    return a.removeprefix("www.") == b.removeprefix("www.")
+
+
+def parse_url_list(lines: list[str]) -> tuple[list[str], int, list[dict]]:
+    """Validate and canonicalise a list of URLs (e.g. the lines of an uploaded file).
+
+    Blank lines and `#` comments are skipped. Returns the unique URLs in input
+    order, the number of duplicates dropped and the rejected entries with their
+    1-based position.
+    """
+    urls: dict[str, None] = {}
+    duplicates = 0
+    invalid = []
+    for position, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            url = canonicalize_url(str(_HTTP_URL.validate_python(line)))
+        except ValidationError as e:
+            invalid.append({"position": position, "url": line[:300], "error": e.errors()[0]["msg"]})
+            continue
+        if url in urls:
+            duplicates += 1
+        else:
+            urls[url] = None
+    return list(urls), duplicates, invalid
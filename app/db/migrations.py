@@ -0,0 +1,68 @@
+from sqlalchemy import inspect, text
+from app.db.models import Base
+from app.core.urls import host_of
+from app.core.normalize import finding_fingerprint
+
+BACKFILL_CHUNK = 5000
+
+
+def _column_ddl(col, dialect) -> str:
+    ddl = f'"{col.name}" {col.type.compile(dialect=dialect)}'
+    default = col.server_default.arg if col.server_default is not None else None
+    if default is not None:
+        # SQLite only accepts NOT NULL on an added column when it has a default
+        ddl += " DEFAULT " + (f"'{default}'" if isinstance(default, str) else str(default))
+        if not col.nullable:
+            ddl += " NOT NULL"
+    return ddl
+
+
+def upgrade_schema(engine):
+    """Bring an existing database up to the current models.
+
+    `create_all` only creates missing tables, so columns and indexes added to
+    existing tables since the database was created are added here.
+    """
+    insp = inspect(engine)
+    existing_tables = set(insp.get_table_names())
+    added: set[tuple[str, str]] = set()
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            have = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name not in have:
+                    conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN {_column_ddl(col, engine.dialect)}'))
+                    added.add((table.name, col.name))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+        _backfill(conn, added)
+
+
+def _backfill(conn, added: set[tuple[str, str]]):
+    """Fill derived columns on rows written before those columns existed."""
+    conn.execute(text("UPDATE scans SET created_at = COALESCE(started_at, finished_at) WHERE created_at IS NULL"))
+    rows = conn.execute(text("SELECT id, url FROM scans WHERE host IS NULL")).all()
+    if rows:
+        conn.execute(text("UPDATE scans SET host = :host WHERE id = :id"), [{"id": r.id, "host": host_of(r.url)} for r in rows])
+    if ("findings", "fingerprint") in added:
+        _backfill_fingerprints(conn)
+
+
+def _backfill_fingerprints(conn):
+    # Older rows stay one per viewport; diffs count each fingerprint once
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT f.id, f.rule_id, f.selector, f.html, s.scan_type, p.url AS page_url "
+            "FROM findings f JOIN scans s ON s.id = f.scan_id LEFT JOIN scan_pages p ON p.id = f.page_id "
+            "WHERE f.id > :last ORDER BY f.id LIMIT :n"
+        ), {"last": last_id, "n": BACKFILL_CHUNK}).all()
+        if not rows:
+            return
+        conn.execute(text("UPDATE findings SET fingerprint = :fp WHERE id = :id"), [
+            {"id": r.id, "fp": finding_fingerprint(r.rule_id, r.selector, r.html, r.page_url if r.scan_type == "crawl" else None)}
+            for r in rows
+        ])
+        last_id = rows[-1].id
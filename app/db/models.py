@@ -1,5 +1,5 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, DateTime, Text, ForeignKey
+from sqlalchemy import String, Integer, Boolean, DateTime, Text, Float, ForeignKey, Index, text
 from datetime import datetime
 
 class Base(DeclarativeBase):
@@ -7,29 +7,106 @@ class Base(DeclarativeBase):
 
 class Scan(Base):
     __tablename__ = "scans"
+    __table_args__ = (
+        Index("ix_scans_status_id", "status", "id"),  # queue claims, history by status
+        Index("ix_scans_host_id", "host", "id"),  # history by host
+        Index("ix_scans_url", "url"),  # history by URL prefix
+        Index("ix_scans_created_at", "created_at"),
+        Index("ix_scans_host_status", "host", "status"),  # per-host concurrency at claim time
+        Index("ix_scans_batch_id", "batch_id"),
+        Index("ix_scans_coalesce_key_status", "coalesce_key", "status"),
+        # One queued/running scan per request key outside batches: concurrent POST /scan coalesce on it
+        Index(
+            "ux_scans_active_coalesce_key", "coalesce_key", unique=True,
+            sqlite_where=text("status IN ('queued', 'running') AND batch_id IS NULL"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     url: Mapped[str] = mapped_column(Text, nullable=False)
+    host: Mapped[str | None] = mapped_column(String(255), nullable=True)
     status: Mapped[str] = mapped_column(String(20), nullable=False, default="queued")  # queued/running/done/failed
+    scan_type: Mapped[str] = mapped_column(String(20), nullable=False, default="page", server_default="page")  # page/crawl
+
+    # Crawl limits (scan_type == "crawl" only)
+    max_pages: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    max_depth: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    use_sitemap: Mapped[bool | None] = mapped_column(Boolean, nullable=True)
+
+    # Canonical URL plus the options that change the result; equal keys are the same request
+    coalesce_key: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Set for scans enqueued through POST /scans/batch
+    batch_id: Mapped[int | None] = mapped_column(ForeignKey("batches.id"), nullable=True)
+
+    # Result cache: force_refresh bypasses it; cache_status is hit/partial/miss/bypass
+    force_refresh: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default="0")
+    cache_status: Mapped[str | None] = mapped_column(String(10), nullable=True)
 
     robots_allowed: Mapped[str] = mapped_column(String(10), nullable=False, default="unknown")  # yes/no/unknown
     error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
 
+    created_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, default=datetime.utcnow)
     started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # Findings re-derived from the archived axe output (python -m app.jobs.renormalize)
+    normalized_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    # Job lease: the claiming worker heartbeats; expired leases are requeued
+    worker_id: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    heartbeat_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    lease_expires_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
 
     summary_json: Mapped[str | None] = mapped_column(Text, nullable=True)
+    screenshots_json: Mapped[str | None] = mapped_column(Text, nullable=True)  # viewport -> stored images
+    stats_json: Mapped[str | None] = mapped_column(Text, nullable=True)  # per-scan pipeline stats
     report_pdf_path: Mapped[str | None] = mapped_column(Text, nullable=True)
 
     findings = relationship("Finding", back_populates="scan", cascade="all, delete-orphan")
+    pages = relationship("ScanPage", back_populates="scan", cascade="all, delete-orphan")
+
+class Batch(Base):
+    """URLs enqueued together; progress and summary are aggregated over its scans."""
+    __tablename__ = "batches"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    name: Mapped[str | None] = mapped_column(String(200), nullable=True)
+    scan_type: Mapped[str] = mapped_column(String(20), nullable=False, default="page")
+    total: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # scans enqueued
+    duplicates: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    rejected: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")  # invalid URLs
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+
+class ScanPage(Base):
+    """One page audited as part of a crawl scan."""
+    __tablename__ = "scan_pages"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    scan_id: Mapped[int] = mapped_column(ForeignKey("scans.id", ondelete="CASCADE"), nullable=False, index=True)
+    url: Mapped[str] = mapped_column(Text, nullable=False)
+    depth: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="running")  # running/done/failed/skipped
+    error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
+    summary_json: Mapped[str | None] = mapped_column(Text, nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    scan = relationship("Scan", back_populates="pages")
 
 class Finding(Base):
     __tablename__ = "findings"
+    __table_args__ = (
+        Index("ix_findings_scan_id", "scan_id"),
+        Index("ix_findings_scan_impact", "scan_id", "impact"),
+        Index("ix_findings_rule_id", "rule_id"),
+        Index("ix_findings_scan_fingerprint", "scan_id", "fingerprint"),  # scan diffs
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     scan_id: Mapped[int] = mapped_column(ForeignKey("scans.id", ondelete="CASCADE"), nullable=False)
+    page_id: Mapped[int | None] = mapped_column(ForeignKey("scan_pages.id", ondelete="CASCADE"), nullable=True)
 
-    viewport: Mapped[str] = mapped_column(String(20), nullable=False)  # mobile/desktop
+    viewport: Mapped[str] = mapped_column(String(100), nullable=False)  # viewports it occurs in, e.g. "desktop,mobile"
+    fingerprint: Mapped[str | None] = mapped_column(String(40), nullable=True)  # see normalize.finding_fingerprint
     rule_id: Mapped[str] = mapped_column(String(200), nullable=False)
     impact: Mapped[str | None] = mapped_column(String(50), nullable=True)
 
@@ -45,3 +122,129 @@ class Finding(Base):
     code_snippet: Mapped[str | None] = mapped_column(Text, nullable=True)
 
     scan = relationship("Scan", back_populates="findings")
+
+class RobotsCache(Base):
+    """robots.txt per origin, shared by all worker processes."""
+    __tablename__ = "robots_cache"
+
+    origin: Mapped[str] = mapped_column(Text, primary_key=True)  # scheme://host[:port]
+    status: Mapped[str] = mapped_column(String(20), nullable=False)  # ok/missing/error
+    status_code: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    body: Mapped[str | None] = mapped_column(Text, nullable=True)
+    etag: Mapped[str | None] = mapped_column(Text, nullable=True)
+    last_modified: Mapped[str | None] = mapped_column(Text, nullable=True)
+    fetched_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    # Last failed fetch; a good body from before it is kept and served
+    last_error_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # Lookups served from this row, and network requests by outcome (exported by /cache/stats and /metrics)
+    hits: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    fetches: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    revalidations: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    errors: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+class Artifact(Base):
+    """A stored file, addressed by the SHA-256 of its content (see app/core/artifacts.py)."""
+    __tablename__ = "artifacts"
+
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    path: Mapped[str] = mapped_column(Text, nullable=False)
+    size: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+
+class ArtifactRef(Base):
+    """One use of an artifact by a scan; an artifact without refs can be collected."""
+    __tablename__ = "artifact_refs"
+    __table_args__ = (
+        Index("ix_artifact_refs_scan_id", "scan_id"),
+        Index("ix_artifact_refs_sha256", "sha256"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    sha256: Mapped[str] = mapped_column(ForeignKey("artifacts.sha256"), nullable=False)
+    scan_id: Mapped[int] = mapped_column(ForeignKey("scans.id", ondelete="CASCADE"), nullable=False)
+    kind: Mapped[str] = mapped_column(String(30), nullable=False)  # screenshot/thumbnail/axe_raw
+    name: Mapped[str | None] = mapped_column(String(100), nullable=True)  # viewport
+    page_id: Mapped[int | None] = mapped_column(Integer, nullable=True)  # crawl page (axe_raw)
+
+class ResultCache(Base):
+    """Latest scan whose findings are valid for a page state (see app/core/result_cache.py)."""
+    __tablename__ = "result_cache"
+    __table_args__ = (
+        Index("ix_result_cache_scan_id", "scan_id"),
+    )
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    url: Mapped[str] = mapped_column(Text, nullable=False)
+    viewport: Mapped[str] = mapped_column(String(20), nullable=False)
+    scan_id: Mapped[int] = mapped_column(ForeignKey("scans.id", ondelete="CASCADE"), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    last_hit_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    hits: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+class ScanTiming(Base):
+    """Seconds a scan spent in one pipeline stage (see app/core/timing.py)."""
+    __tablename__ = "scan_timings"
+    __table_args__ = (
+        Index("ix_scan_timings_scan_stage", "scan_id", "stage", unique=True),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    scan_id: Mapped[int] = mapped_column(ForeignKey("scans.id", ondelete="CASCADE"), nullable=False)
+    stage: Mapped[str] = mapped_column(String(40), nullable=False)
+    seconds: Mapped[float] = mapped_column(Float, nullable=False)
+    calls: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
+
+class StageHistogram(Base):
+    """Running totals behind the /metrics stage histograms: observations per stage and bucket.
+
+    Only ever incremented (retention doesn't touch it), so the exported values are
+    proper counters. `le` is the bucket's upper bound, inf for the overflow bucket.
+    """
+    __tablename__ = "stage_histograms"
+
+    stage: Mapped[str] = mapped_column(String(40), primary_key=True)
+    le: Mapped[float] = mapped_column(Float, primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    sum_seconds: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+
+class WorkerStats(Base):
+    """Counters of one worker process, written on every heartbeat (exported by /metrics)."""
+    __tablename__ = "worker_stats"
+
+    worker_id: Mapped[str] = mapped_column(String(100), primary_key=True)
+    started_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    heartbeat_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    in_flight: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    scans_finished: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    scans_errored: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    browser_launches: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+class HostSettleStats(Base):
+    """How long pages of a host take to settle after DOMContentLoaded (see app/scanners/settle.py)."""
+    __tablename__ = "host_settle_stats"
+
+    host: Mapped[str] = mapped_column(String(255), primary_key=True)
+    samples: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    ewma_ms: Mapped[float] = mapped_column(Float, nullable=False)
+    last_ms: Mapped[float] = mapped_column(Float, nullable=False)
+    timeouts: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+class HostLimit(Base):
+    """Rate-limit state per host, shared by all workers (GCRA, see app/core/politeness.py)."""
+    __tablename__ = "host_limits"
+
+    host: Mapped[str] = mapped_column(String(255), primary_key=True)
+    tat: Mapped[float] = mapped_column(Float, nullable=False)  # theoretical arrival time, unix seconds
+    tolerance: Mapped[float] = mapped_column(Float, nullable=False)  # burst allowance, seconds
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+class MaintenanceLease(Base):
+    """A maintenance task only one process should run at a time (e.g. VACUUM)."""
+    __tablename__ = "maintenance_leases"
+
+    name: Mapped[str] = mapped_column(String(40), primary_key=True)
+    holder: Mapped[str] = mapped_column(String(100), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
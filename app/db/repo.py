@@ -1,139 +1,1159 @@
 import json
-from datetime import datetime
-from sqlalchemy import select, update
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update, insert, delete, and_, or_, func, exists, literal
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from app.config import settings
+from app.core.urls import host_of
+from app.core.timing import bucket_bound
 from app.db.session import get_session
-from app.db.models import Scan, Finding
+from app.db.models import (
+    Scan, ScanPage, Finding, RobotsCache, Artifact, ArtifactRef, ResultCache, ScanTiming, WorkerStats,
+    HostSettleStats, HostLimit, Batch, StageHistogram, MaintenanceLease,
+)
+
+class LeaseLost(Exception):
+    """A worker's final write matched no row: its lease expired and the scan was requeued."""
+
+
+# Inserts retried when a concurrent request creates the same active scan
+COALESCE_ATTEMPTS = 3
+
+# Finding fields exposed by the API, in output order
+FINDING_COLUMNS = {
+    "id": Finding.id,
+    "page_id": Finding.page_id,
+    "fingerprint": Finding.fingerprint,
+    "viewport": Finding.viewport,
+    "rule_id": Finding.rule_id,
+    "impact": Finding.impact,
+    "wcag": Finding.wcag,
+    "description": Finding.description,
+    "help_url": Finding.help_url,
+    "selector": Finding.selector,
+    "html": Finding.html,
+    "screenshot_path": Finding.screenshot_path,
+    "fix_hint": Finding.fix_hint,
+    "code_snippet": Finding.code_snippet,
+}
+
+def _finding_dict(row) -> dict:
+    out = dict(row)
+    if "wcag" in out:
+        out["wcag"] = json.loads(out["wcag"]) if out["wcag"] else []
+    return out
+
+def _has_viewport(viewport: str):
+    # Finding.viewport is a comma-separated set
+    return (literal(",") + Finding.viewport + literal(",")).like(f"%,{viewport},%")
+
+def _naive_utc(dt: datetime) -> datetime:
+    # Timestamps are stored as naive UTC
+    return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
+
+def _prefix_upper(prefix: str) -> str | None:
+    """Smallest string greater than every string starting with prefix (None: no bound).
+
+    Lets a prefix filter be a range on an index; SQLite compares text bytewise,
+    and UTF-8 byte order is code point order.
+    """
+    while prefix:
+        last = ord(prefix[-1]) + 1
+        if last == 0xD800:
+            last = 0xE000  # surrogates can't be stored
+        if last <= 0x10FFFF:
+            return prefix[:-1] + chr(last)
+        prefix = prefix[:-1]
+    return None
 
 class ScanRepo:
     @staticmethod
-    def create_scan(url: str) -> int:
+    def create_scan(
+        url: str,
+        scan_type: str = "page",
+        max_pages: int | None = None,
+        max_depth: int | None = None,
+        use_sitemap: bool | None = None,
+        force_refresh: bool = False,
+    ) -> int:
         with get_session() as db:
-            scan = Scan(url=url, status="queued", robots_allowed="unknown")
+            scan = Scan(
+                url=url, host=host_of(url), status="queued", robots_allowed="unknown", scan_type=scan_type,
+                max_pages=max_pages, max_depth=max_depth, use_sitemap=use_sitemap, force_refresh=force_refresh,
+            )
             db.add(scan)
             db.commit()
             db.refresh(scan)
             return scan.id
 
     @staticmethod
-    def claim_next_queued_scan() -> int | None:
-        """Claim one queued scan (SQLite-safe via optimistic update)."""
+    def create_or_get_scan(
+        url: str,
+        coalesce_key: str,
+        reuse_window_seconds: float = 0,
+        also_join: tuple[str, ...] = (),
+        scan_type: str = "page",
+        max_pages: int | None = None,
+        max_depth: int | None = None,
+        use_sitemap: bool | None = None,
+        force_refresh: bool = False,
+    ) -> tuple[int, bool]:
+        """Queue a scan unless an equivalent one is queued or running, or finished within the window.
+
+        Scans with coalesce_key or any of also_join (e.g. the same request with
+        force_refresh) count as equivalent. Returns (scan_id, coalesced). Two requests racing past the lookup both
+        insert; the partial unique index on active scans rejects the second, which
+        then picks up the first one's scan.
+        """
+        keys = (coalesce_key, *also_join)
+        for attempt in range(COALESCE_ATTEMPTS):
+            with get_session() as db:
+                active = db.execute(
+                    select(Scan.id)
+                    .where(Scan.coalesce_key.in_(keys), Scan.status.in_(("queued", "running")))
+                    .order_by(Scan.id)
+                    .limit(1)
+                ).scalar()
+                if active is not None:
+                    return active, True
+                if reuse_window_seconds > 0:
+                    recent = db.execute(
+                        select(Scan.id)
+                        .where(
+                            Scan.coalesce_key.in_(keys), Scan.status == "done",
+                            Scan.finished_at >= datetime.utcnow() - timedelta(seconds=reuse_window_seconds),
+                        )
+                        .order_by(Scan.finished_at.desc())
+                        .limit(1)
+                    ).scalar()
+                    if recent is not None:
+                        return recent, True
+                scan = Scan(
+                    url=url, host=host_of(url), status="queued", robots_allowed="unknown", scan_type=scan_type,
+                    max_pages=max_pages, max_depth=max_depth, use_sitemap=use_sitemap, force_refresh=force_refresh,
+                    coalesce_key=coalesce_key,
+                )
+                db.add(scan)
+                try:
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()
+                    if attempt == COALESCE_ATTEMPTS - 1:
+                        raise
+                    continue
+                return scan.id, False
+
+    @staticmethod
+    def claim_next_queued_scan(worker_id: str | None = None) -> int | None:
+        """Atomically claim the oldest queued scan and take a lease on it.
+
+        Scans of hosts that already have HOST_MAX_CONCURRENCY running scans, or
+        whose rate limit has no token left, are skipped so work for other hosts
+        is picked up instead.
+        """
+        now = datetime.utcnow()
+        claimable = [Scan.status == "queued"]
+        if settings.host_max_concurrency > 0:
+            running = aliased(Scan)
+            claimable.append(
+                select(func.count()).select_from(running)
+                .where(running.host == Scan.host, running.status == "running")
+                .scalar_subquery() < settings.host_max_concurrency
+            )
+        claimable.append(~exists().where(HostLimit.host == Scan.host, HostLimit.tat - HostLimit.tolerance > time.time()))
+        oldest = select(Scan.id).where(*claimable).order_by(Scan.id.asc()).limit(1).scalar_subquery()
         with get_session() as db:
-            scan_id = db.scalar(select(Scan.id).where(Scan.status == "queued").order_by(Scan.id.asc()))
-            if scan_id is None:
-                return None
+            scan_id = db.execute(
+                update(Scan)
+                .where(Scan.id == oldest, Scan.status == "queued")
+                .values(
+                    status="running", started_at=now, error_message=None, worker_id=worker_id,
+                    heartbeat_at=now, lease_expires_at=now + timedelta(seconds=settings.job_lease_seconds),
+                    attempts=Scan.attempts + 1,
+                )
+                .returning(Scan.id)
+                .execution_options(synchronize_session=False)
+            ).scalar()
+            db.commit()
+            return scan_id
+
+    @staticmethod
+    def heartbeat(worker_id: str, scan_ids: list[int]):
+        """Extend the leases of scans this worker is still running."""
+        if not scan_ids:
+            return
+        now = datetime.utcnow()
+        with get_session() as db:
+            db.execute(
+                update(Scan)
+                .where(Scan.id.in_(scan_ids), Scan.status == "running", Scan.worker_id == worker_id)
+                .values(heartbeat_at=now, lease_expires_at=now + timedelta(seconds=settings.job_lease_seconds))
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+
+    @staticmethod
+    def requeue_expired_leases() -> int:
+        """Requeue running scans whose worker stopped heartbeating; fail them after too many attempts."""
+        now = datetime.utcnow()
+        expired = and_(
+            Scan.status == "running",
+            or_(
+                Scan.lease_expires_at < now,
+                # Rows claimed before leases existed
+                and_(Scan.lease_expires_at.is_(None), Scan.started_at < now - timedelta(seconds=settings.job_lease_seconds)),
+            ),
+        )
+        cleared = {"worker_id": None, "lease_expires_at": None, "heartbeat_at": None}
+        with get_session() as db:
+            db.execute(
+                update(Scan)
+                .where(expired, Scan.attempts >= settings.job_max_attempts)
+                .values(status="failed", finished_at=now, error_message="Worker lease expired too many times", **cleared)
+                .execution_options(synchronize_session=False)
+            )
             res = db.execute(
                 update(Scan)
-                .where(Scan.id == scan_id, Scan.status == "queued")
-                .values(status="running", started_at=datetime.utcnow(), error_message=None)
+                .where(expired)
+                .values(status="queued", started_at=None, **cleared)
+                .execution_options(synchronize_session=False)
             )
             db.commit()
-            if res.rowcount == 1:
-                return scan_id
-            return None
+            return res.rowcount
 
     @staticmethod
-    def set_scan_done(scan_id: int, robots_allowed: bool, summary: dict, report_pdf_path: str):
+    def requeue_scans(scan_ids: list[int]):
+        """Hand claimed-but-unstarted scans back to the queue."""
+        if not scan_ids:
+            return
         with get_session() as db:
-            scan = db.get(Scan, scan_id)
-            if not scan:
-                return
-            scan.status = "done"
-            scan.robots_allowed = "yes" if robots_allowed else "no"
-            scan.summary_json = json.dumps(summary, ensure_ascii=False)
-            scan.report_pdf_path = report_pdf_path
-            scan.finished_at = datetime.utcnow()
+            db.execute(
+                update(Scan)
+                .where(Scan.id.in_(scan_ids), Scan.status == "running")
+                .values(
+                    status="queued", started_at=None, worker_id=None, lease_expires_at=None, heartbeat_at=None,
+                    attempts=Scan.attempts - 1,
+                )
+                .execution_options(synchronize_session=False)
+            )
             db.commit()
 
     @staticmethod
-    def set_scan_failed(scan_id: int, robots_allowed: str = "unknown", error_message: str = "Scan failed"):
+    def _owned(scan_id: int, worker_id: str | None):
+        """Row filter for a scan's final writes: with a worker_id, only while that worker holds the lease."""
+        if worker_id is None:
+            return Scan.id == scan_id
+        return and_(Scan.id == scan_id, Scan.status == "running", Scan.worker_id == worker_id)
+
+    @staticmethod
+    def set_scan_done(
+        scan_id: int,
+        robots_allowed: bool,
+        summary: dict,
+        screenshots: dict[str, dict],
+        stats: dict | None = None,
+        cache_status: str | None = None,
+        worker_id: str | None = None,
+    ) -> bool:
+        """Store a scan's result; False if the worker lost its lease (the result is dropped)."""
         with get_session() as db:
-            scan = db.get(Scan, scan_id)
-            if not scan:
+            res = db.execute(
+                update(Scan)
+                .where(ScanRepo._owned(scan_id, worker_id))
+                .values(
+                    status="done",
+                    robots_allowed="yes" if robots_allowed else "no",
+                    summary_json=json.dumps(summary, ensure_ascii=False),
+                    screenshots_json=json.dumps(screenshots, ensure_ascii=False),
+                    stats_json=json.dumps(stats) if stats else None,
+                    cache_status=cache_status,
+                    report_pdf_path=None,
+                    finished_at=datetime.utcnow(),
+                    lease_expires_at=None,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            return res.rowcount > 0
+
+    @staticmethod
+    def set_report_path(scan_id: int, report_pdf_path: str):
+        with get_session() as db:
+            db.execute(update(Scan).where(Scan.id == scan_id).values(report_pdf_path=report_pdf_path))
+            db.commit()
+
+    @staticmethod
+    def set_scan_failed(
+        scan_id: int, robots_allowed: str = "unknown", error_message: str = "Scan failed", worker_id: str | None = None,
+    ) -> bool:
+        with get_session() as db:
+            res = db.execute(
+                update(Scan)
+                .where(ScanRepo._owned(scan_id, worker_id))
+                .values(
+                    status="failed", robots_allowed=robots_allowed, error_message=error_message,
+                    finished_at=datetime.utcnow(), lease_expires_at=None,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            return res.rowcount > 0
+
+    @staticmethod
+    def save_timings(scan_id: int, timings: dict[str, dict]):
+        """Store per-stage timings; a stage recorded again (retry, re-render) is replaced."""
+        if not timings:
+            return
+        rows = [{"scan_id": scan_id, "stage": name, "seconds": t["seconds"], "calls": t["calls"]} for name, t in timings.items()]
+        stmt = sqlite_insert(ScanTiming).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ScanTiming.scan_id, ScanTiming.stage],
+            set_={"seconds": stmt.excluded.seconds, "calls": stmt.excluded.calls},
+        )
+        hist = sqlite_insert(StageHistogram).values([
+            {"stage": name, "le": bucket_bound(t["seconds"]), "count": 1, "sum_seconds": t["seconds"]}
+            for name, t in timings.items()
+        ])
+        hist = hist.on_conflict_do_update(
+            index_elements=[StageHistogram.stage, StageHistogram.le],
+            set_={"count": StageHistogram.count + 1, "sum_seconds": StageHistogram.sum_seconds + hist.excluded.sum_seconds},
+        )
+        with get_session() as db:
+            if db.get(Scan, scan_id) is None:
                 return
-            scan.status = "failed"
-            scan.robots_allowed = robots_allowed
-            scan.error_message = error_message
-            scan.finished_at = datetime.utcnow()
+            db.execute(stmt)
+            # Every save is an observation, also when it replaces a stage's row above
+            db.execute(hist)
+            db.commit()
+
+    @staticmethod
+    def _finding_values(scan_id: int, f: dict) -> dict:
+        return {
+            "scan_id": scan_id,
+            "page_id": f.get("page_id"),
+            "viewport": f.get("viewport", "unknown"),
+            "fingerprint": f.get("fingerprint"),
+            "rule_id": f.get("rule_id", ""),
+            "impact": f.get("impact"),
+            "wcag": json.dumps(f.get("wcag", []), ensure_ascii=False),
+            "description": f.get("description"),
+            "help_url": f.get("help_url"),
+            "selector": f.get("selector"),
+            "html": f.get("html"),
+            "screenshot_path": f.get("screenshot_path"),
+            "fix_hint": f.get("fix_hint"),
+            "code_snippet": f.get("code_snippet"),
+        }
+
+    @staticmethod
+    def _lock_owned(db, scan_id: int, worker_id: str | None) -> bool:
+        # A no-op UPDATE takes SQLite's write lock first, so the ownership check
+        # and the writes that follow are one atomic step
+        res = db.execute(
+            update(Scan)
+            .where(ScanRepo._owned(scan_id, worker_id))
+            .values(id=Scan.id)
+            .execution_options(synchronize_session=False)
+        )
+        return res.rowcount > 0
+
+    @staticmethod
+    def replace_findings(scan_id: int, findings: list[dict], worker_id: str | None = None) -> bool:
+        """Swap a scan's findings in one transaction, so readers never see an empty scan.
+
+        False if the scan is gone or, with a worker_id, that worker lost its lease.
+        """
+        rows = [ScanRepo._finding_values(scan_id, f) for f in findings]
+        with get_session() as db:
+            if not ScanRepo._lock_owned(db, scan_id, worker_id):
+                db.rollback()
+                return False
+            db.execute(delete(Finding).where(Finding.scan_id == scan_id))
+            if rows:
+                # executemany of one prepared INSERT instead of one ORM object per row
+                db.execute(insert(Finding), rows)
+            db.commit()
+            return True
+
+    @staticmethod
+    def add_findings(scan_id: int, findings: list[dict], worker_id: str | None = None) -> bool:
+        """Append findings (crawl scans persist page by page)."""
+        if not findings:
+            return True
+        with get_session() as db:
+            if not ScanRepo._lock_owned(db, scan_id, worker_id):
+                db.rollback()
+                return False
+            db.execute(insert(Finding), [ScanRepo._finding_values(scan_id, f) for f in findings])
             db.commit()
+            return True
 
     @staticmethod
-    def replace_findings(scan_id: int, findings: list[dict]):
+    def replace_results(scan_id: int, findings: list[dict], summary: dict, page_summaries: dict[int, dict] | None = None):
+        """Swap a finished scan's findings and summaries in one transaction (re-normalization)."""
+        rows = [ScanRepo._finding_values(scan_id, f) for f in findings]
         with get_session() as db:
             scan = db.get(Scan, scan_id)
-            if not scan:
+            if scan is None:
                 return
+            db.execute(delete(Finding).where(Finding.scan_id == scan_id))
+            if rows:
+                db.execute(insert(Finding), rows)
+            for page_id, page_summary in (page_summaries or {}).items():
+                db.execute(
+                    update(ScanPage).where(ScanPage.id == page_id).values(summary_json=json.dumps(page_summary, ensure_ascii=False))
+                )
+            scan.summary_json = json.dumps(summary, ensure_ascii=False)
+            scan.normalized_at = datetime.utcnow()
+            db.commit()
 
-            # delete existing
-            db.query(Finding).filter(Finding.scan_id == scan_id).delete()
-            db.commit()
-
-            for f in findings:
-                db.add(Finding(
-                    scan_id=scan_id,
-                    viewport=f.get("viewport", "unknown"),
-                    rule_id=f.get("rule_id", ""),
-                    impact=f.get("impact"),
-                    wcag=json.dumps(f.get("wcag", []), ensure_ascii=False),
-                    description=f.get("description"),
-                    help_url=f.get("help_url"),
-                    selector=f.get("selector"),
-                    html=f.get("html"),
-                    screenshot_path=f.get("screenshot_path"),
-                    fix_hint=f.get("fix_hint"),
-                    code_snippet=f.get("code_snippet"),
-                ))
+    @staticmethod
+    def viewport_findings(scan_id: int, viewport: str) -> list[dict]:
+        """One viewport's findings of a scan, in the shape normalize_axe_results produces."""
+        cols = [c for name, c in FINDING_COLUMNS.items() if name != "id"]
+        with get_session() as db:
+            rows = db.execute(
+                select(*cols).where(Finding.scan_id == scan_id, _has_viewport(viewport)).order_by(Finding.id.asc())
+            )
+            return [{**_finding_dict(row._mapping), "viewport": viewport} for row in rows]
+
+    @staticmethod
+    def reset_crawl(scan_id: int):
+        """Drop pages and findings left over from an earlier attempt of this crawl."""
+        with get_session() as db:
+            db.execute(delete(Finding).where(Finding.scan_id == scan_id))
+            db.execute(delete(ScanPage).where(ScanPage.scan_id == scan_id))
+            db.commit()
+
+    @staticmethod
+    def add_page(scan_id: int, url: str, depth: int) -> int:
+        with get_session() as db:
+            page = ScanPage(scan_id=scan_id, url=url, depth=depth, status="running")
+            db.add(page)
             db.commit()
+            db.refresh(page)
+            return page.id
 
     @staticmethod
-    def get_scan(scan_id: int) -> dict | None:
+    def finish_page(page_id: int, status: str, summary: dict | None = None, error_message: str | None = None):
+        with get_session() as db:
+            page = db.get(ScanPage, page_id)
+            if not page:
+                return
+            page.status = status
+            page.summary_json = json.dumps(summary, ensure_ascii=False) if summary is not None else None
+            page.error_message = error_message
+            page.finished_at = datetime.utcnow()
+            db.commit()
+
+    @staticmethod
+    def list_pages(scan_id: int) -> list[dict]:
+        with get_session() as db:
+            pages = db.scalars(select(ScanPage).where(ScanPage.scan_id == scan_id).order_by(ScanPage.id.asc())).all()
+            return [
+                {
+                    "id": p.id,
+                    "url": p.url,
+                    "depth": p.depth,
+                    "status": p.status,
+                    "error_message": p.error_message,
+                    "summary": json.loads(p.summary_json) if p.summary_json else None,
+                    "finished_at": p.finished_at.isoformat() if p.finished_at else None,
+                } for p in pages
+            ]
+
+    @staticmethod
+    def get_scan(scan_id: int, include_findings: bool = False) -> dict | None:
+        """Scan status and summary; findings only on request (they can be large)."""
         with get_session() as db:
             scan = db.get(Scan, scan_id)
             if not scan:
                 return None
-            findings = db.scalars(select(Finding).where(Finding.scan_id == scan_id).order_by(Finding.id.asc())).all()
             summary = json.loads(scan.summary_json) if scan.summary_json else None
-            return {
+            out = {
                 "id": scan.id,
                 "url": scan.url,
+                "host": scan.host,
                 "status": scan.status,
+                "scan_type": scan.scan_type,
+                "batch_id": scan.batch_id,
+                "force_refresh": scan.force_refresh,
+                "cache_status": scan.cache_status,
+                "max_pages": scan.max_pages,
+                "max_depth": scan.max_depth,
+                "use_sitemap": scan.use_sitemap,
                 "robots_allowed": scan.robots_allowed,
                 "error_message": scan.error_message,
+                "created_at": scan.created_at.isoformat() if scan.created_at else None,
                 "started_at": scan.started_at.isoformat() if scan.started_at else None,
                 "finished_at": scan.finished_at.isoformat() if scan.finished_at else None,
+                "normalized_at": scan.normalized_at.isoformat() if scan.normalized_at else None,
                 "summary": summary,
+                "screenshots": json.loads(scan.screenshots_json) if scan.screenshots_json else None,
+                "stats": json.loads(scan.stats_json) if scan.stats_json else None,
+                "timings": {
+                    stage: {"seconds": seconds, "calls": calls}
+                    for stage, seconds, calls in db.execute(
+                        select(ScanTiming.stage, ScanTiming.seconds, ScanTiming.calls)
+                        .where(ScanTiming.scan_id == scan_id).order_by(ScanTiming.id)
+                    )
+                },
                 "report_pdf_path": scan.report_pdf_path,
-                "report_pdf_url": f"/report/{scan.id}.pdf" if scan.report_pdf_path else None,
-                "findings": [
-                    {
-                        "id": f.id,
-                        "viewport": f.viewport,
-                        "rule_id": f.rule_id,
-                        "impact": f.impact,
-                        "wcag": json.loads(f.wcag) if f.wcag else [],
-                        "description": f.description,
-                        "help_url": f.help_url,
-                        "selector": f.selector,
-                        "html": f.html,
-                        "screenshot_path": f.screenshot_path,
-                        "fix_hint": f.fix_hint,
-                        "code_snippet": f.code_snippet,
-                    } for f in findings
-                ]
+                # Reports are rendered on first download
+                "report_pdf_url": f"/report/{scan.id}.pdf" if scan.status == "done" else None,
+                "findings_url": f"/scan/{scan.id}/findings",
             }
+            if include_findings:
+                findings = db.execute(select(*FINDING_COLUMNS.values()).where(Finding.scan_id == scan_id).order_by(Finding.id.asc()))
+                out["findings"] = [_finding_dict(row._mapping) for row in findings]
+            return out
 
     @staticmethod
-    def list_scans(limit: int = 50) -> list[dict]:
+    def list_findings(
+        scan_id: int,
+        after_id: int | None = None,
+        limit: int = 100,
+        severity: list[str] | None = None,
+        rule_id: str | None = None,
+        viewport: str | None = None,
+        wcag: str | None = None,
+        page_id: int | None = None,
+        fields: list[str] | None = None,
+    ) -> dict:
+        """Keyset-paginated findings of one scan (ordered by id).
+
+        Pass the returned next_cursor as after_id to get the next page. `fields`
+        restricts the columns read, so large html/code_snippet values are only
+        loaded when asked for.
+        """
+        wanted = [f for f in (fields or FINDING_COLUMNS) if f in FINDING_COLUMNS]
+        if "id" not in wanted:
+            wanted.insert(0, "id")
+
+        stmt = select(*(FINDING_COLUMNS[f] for f in wanted)).where(Finding.scan_id == scan_id)
+        if after_id is not None:
+            stmt = stmt.where(Finding.id > after_id)
+        if severity:
+            stmt = stmt.where(Finding.impact.in_([s.lower() for s in severity]))
+        if rule_id:
+            stmt = stmt.where(Finding.rule_id == rule_id)
+        if viewport:
+            stmt = stmt.where(_has_viewport(viewport))
+        if wcag:
+            # wcag is stored as a JSON array of strings
+            stmt = stmt.where(Finding.wcag.contains(f'"{wcag}"', autoescape=True))
+        if page_id is not None:
+            stmt = stmt.where(Finding.page_id == page_id)
+        stmt = stmt.order_by(Finding.id.asc()).limit(limit + 1)
+
+        with get_session() as db:
+            rows = db.execute(stmt).all()
+        items = [_finding_dict(row._mapping) for row in rows[:limit]]
+        next_cursor = items[-1]["id"] if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    @staticmethod
+    def diff_findings(base_id: int, head_id: int, limit: int = 500, fields: list[str] | None = None) -> dict:
+        """Findings new in head, fixed since base, and unchanged, matched by fingerprint.
+
+        Each side is an anti-join / semi-join on the (scan_id, fingerprint) index.
+        Lists are capped at `limit` per category; counts are exact.
+        """
+        wanted = [f for f in (fields or ("id", "fingerprint", "viewport", "rule_id", "impact", "selector", "page_id"))
+                  if f in FINDING_COLUMNS]
+
+        def side(scan_id: int, other_id: int, present: bool):
+            other = aliased(Finding)
+            match = exists().where(other.scan_id == other_id, other.fingerprint == Finding.fingerprint)
+            cond = and_(Finding.scan_id == scan_id, Finding.fingerprint.is_not(None), match if present else ~match)
+            # Rows from before viewport merging repeat a fingerprint; report each once
+            first_ids = select(func.min(Finding.id)).where(cond).group_by(Finding.fingerprint)
+            count = select(func.count(func.distinct(Finding.fingerprint))).where(cond)
+            items = (
+                select(*(FINDING_COLUMNS[f] for f in wanted))
+                .where(Finding.id.in_(first_ids))
+                .order_by(Finding.id.asc())
+                .limit(limit)
+            )
+            return count, items
+
+        out = {"base": base_id, "head": head_id, "counts": {}}
+        with get_session() as db:
+            for name, (scan_id, other_id, present) in {
+                "new": (head_id, base_id, False),
+                "fixed": (base_id, head_id, False),
+                "unchanged": (head_id, base_id, True),
+            }.items():
+                count, items = side(scan_id, other_id, present)
+                out["counts"][name] = db.scalar(count)
+                out[name] = [_finding_dict(row._mapping) for row in db.execute(items)]
+        return out
+
+    @staticmethod
+    def list_scans(
+        limit: int = 50,
+        before_id: int | None = None,
+        status: str | None = None,
+        host: str | None = None,
+        url_prefix: str | None = None,
+        created_from: datetime | None = None,
+        created_to: datetime | None = None,
+        include_summary: bool = False,
+        batch_id: int | None = None,
+    ) -> dict:
+        """Scan history, newest first, keyset-paginated on id.
+
+        Pass the returned next_cursor as before_id for the next page. Status and host
+        filters are served by the (status, id) and (host, id) indexes.
+        """
+        stmt = select(Scan)
+        if before_id is not None:
+            stmt = stmt.where(Scan.id < before_id)
+        if status:
+            stmt = stmt.where(Scan.status == status)
+        if host:
+            stmt = stmt.where(Scan.host == host.lower())
+        if url_prefix:
+            # A range rather than LIKE so ix_scans_url is used
+            stmt = stmt.where(Scan.url >= url_prefix)
+            upper = _prefix_upper(url_prefix)
+            if upper is not None:
+                stmt = stmt.where(Scan.url < upper)
+        if batch_id is not None:
+            stmt = stmt.where(Scan.batch_id == batch_id)
+        if created_from:
+            stmt = stmt.where(Scan.created_at >= _naive_utc(created_from))
+        if created_to:
+            stmt = stmt.where(Scan.created_at < _naive_utc(created_to))
+        stmt = stmt.order_by(Scan.id.desc()).limit(limit + 1)
+
         with get_session() as db:
-            scans = db.scalars(select(Scan).order_by(Scan.id.desc()).limit(limit)).all()
+            scans = db.scalars(stmt).all()
             items = []
-            for s in scans:
-                items.append({
+            for s in scans[:limit]:
+                item = {
                     "id": s.id,
                     "url": s.url,
+                    "host": s.host,
                     "status": s.status,
+                    "scan_type": s.scan_type,
+                    "cache_status": s.cache_status,
                     "robots_allowed": s.robots_allowed,
+                    "created_at": s.created_at.isoformat() if s.created_at else None,
                     "started_at": s.started_at.isoformat() if s.started_at else None,
                     "finished_at": s.finished_at.isoformat() if s.finished_at else None,
-                    "report_pdf_url": f"/report/{s.id}.pdf" if s.report_pdf_path else None,
-                })
-            return items
+                    "report_pdf_url": f"/report/{s.id}.pdf" if s.status == "done" else None,
+                }
+                if include_summary:
+                    item["summary"] = json.loads(s.summary_json) if s.summary_json else None
+                items.append(item)
+            next_cursor = items[-1]["id"] if len(scans) > limit else None
+            return {"items": items, "next_cursor": next_cursor}
+
+    @staticmethod
+    def expired_scan_ids(max_age_days: int, max_scans_per_url: int) -> list[int]:
+        """Finished scans that fall outside the retention policy (0 disables a rule)."""
+        finished = Scan.status.in_(("done", "failed"))
+        ids: set[int] = set()
+        with get_session() as db:
+            if max_age_days:
+                cutoff = datetime.utcnow() - timedelta(days=max_age_days)
+                ids.update(db.scalars(select(Scan.id).where(finished, Scan.finished_at < cutoff)))
+            if max_scans_per_url:
+                ranked = (
+                    select(Scan.id, func.row_number().over(partition_by=Scan.url, order_by=Scan.id.desc()).label("rn"))
+                    .where(finished)
+                    .subquery()
+                )
+                ids.update(db.scalars(select(ranked.c.id).where(ranked.c.rn > max_scans_per_url)))
+        return sorted(ids)
+
+    @staticmethod
+    def oldest_finished_scan_ids(after_id: int = 0, limit: int = 500) -> list[int]:
+        with get_session() as db:
+            return list(db.scalars(
+                select(Scan.id)
+                .where(Scan.status.in_(("done", "failed")), Scan.id > after_id)
+                .order_by(Scan.id.asc())
+                .limit(limit)
+            ))
+
+    @staticmethod
+    def report_paths(scan_ids: list[int]) -> dict[int, str | None]:
+        """Current report path of each scan that still exists."""
+        with get_session() as db:
+            return dict(db.execute(select(Scan.id, Scan.report_pdf_path).where(Scan.id.in_(scan_ids))).all())
+
+    @staticmethod
+    def purge_scans(scan_ids: list[int], chunk: int = 500) -> int:
+        """Delete scans with their pages, findings and artifact references."""
+        purged = 0
+        with get_session() as db:
+            for i in range(0, len(scan_ids), chunk):
+                ids = scan_ids[i:i + chunk]
+                db.execute(delete(ArtifactRef).where(ArtifactRef.scan_id.in_(ids)))
+                db.execute(delete(ResultCache).where(ResultCache.scan_id.in_(ids)))
+                db.execute(delete(ScanTiming).where(ScanTiming.scan_id.in_(ids)))
+                db.execute(delete(Finding).where(Finding.scan_id.in_(ids)))
+                db.execute(delete(ScanPage).where(ScanPage.scan_id.in_(ids)))
+                purged += db.execute(
+                    delete(Scan).where(Scan.id.in_(ids), Scan.status.in_(("done", "failed")))
+                ).rowcount
+                # Short transactions: don't hold the write lock against workers
+                db.commit()
+        return purged
+
+
+class BatchRepo:
+    @staticmethod
+    def create_batch(
+        urls: list[str],
+        scan_type: str = "page",
+        name: str | None = None,
+        coalesce_keys: list[str] | None = None,
+        duplicates: int = 0,
+        rejected: int = 0,
+        max_pages: int | None = None,
+        max_depth: int | None = None,
+        use_sitemap: bool | None = None,
+        force_refresh: bool = False,
+    ) -> int:
+        """Create a batch and queue one scan per URL, in a single transaction."""
+        now = datetime.utcnow()
+        with get_session() as db:
+            batch = Batch(
+                name=name, scan_type=scan_type, total=len(urls), duplicates=duplicates, rejected=rejected, created_at=now,
+            )
+            db.add(batch)
+            db.flush()
+            rows = [
+                {
+                    "url": url, "host": host_of(url), "status": "queued", "robots_allowed": "unknown",
+                    "scan_type": scan_type, "max_pages": max_pages, "max_depth": max_depth, "use_sitemap": use_sitemap,
+                    "force_refresh": force_refresh, "batch_id": batch.id, "created_at": now,
+                    # Lets single requests join these scans; batches themselves never coalesce
+                    "coalesce_key": key,
+                }
+                for url, key in zip(urls, coalesce_keys or [None] * len(urls))
+            ]
+            if rows:
+                # executemany: one prepared statement for all rows
+                db.execute(insert(Scan), rows)
+            db.commit()
+            return batch.id
+
+    @staticmethod
+    def get_batch(batch_id: int) -> dict | None:
+        """Batch with scan counts per status; finished once nothing is queued or running."""
+        with get_session() as db:
+            batch = db.get(Batch, batch_id)
+            if not batch:
+                return None
+            counts = dict(db.execute(
+                select(Scan.status, func.count()).where(Scan.batch_id == batch_id).group_by(Scan.status)
+            ).all())
+            last_finished = db.execute(select(func.max(Scan.finished_at)).where(Scan.batch_id == batch_id)).scalar()
+        by_status = {status: counts.get(status, 0) for status in ("queued", "running", "done", "failed")}
+        completed = by_status["done"] + by_status["failed"]
+        total = sum(counts.values())
+        finished = total > 0 and completed == total
+        return {
+            "id": batch.id,
+            "name": batch.name,
+            "scan_type": batch.scan_type,
+            "created_at": batch.created_at.isoformat(),
+            "total": total,
+            "duplicates": batch.duplicates,
+            "rejected": batch.rejected,
+            "counts": by_status,
+            "completed": completed,
+            "progress": round(completed / total, 4) if total else 1.0,
+            "finished": finished,
+            "finished_at": last_finished.isoformat() if finished and last_finished else None,
+            "scans_url": f"/scans?batch_id={batch.id}",
+            "summary_url": f"/batch/{batch.id}/summary",
+        }
+
+    @staticmethod
+    def summary(batch_id: int, top_n: int = 10) -> dict:
+        """Findings across the batch's finished scans: severity totals, top rules, worst URLs, failures."""
+        with get_session() as db:
+            scans = db.execute(
+                select(Scan.id, Scan.url, Scan.status, Scan.summary_json, Scan.error_message)
+                .where(Scan.batch_id == batch_id, Scan.status.in_(("done", "failed")))
+                .order_by(Scan.id)
+            ).all()
+            rules = db.execute(
+                select(Finding.rule_id, func.count(), func.count(func.distinct(Finding.scan_id)))
+                .join(Scan, Scan.id == Finding.scan_id)
+                .where(Scan.batch_id == batch_id, Scan.status == "done")
+                .group_by(Finding.rule_id)
+                .order_by(func.count().desc())
+                .limit(top_n)
+            ).all()
+
+        totals = {"total": 0, "critical": 0, "serious": 0, "moderate": 0, "minor": 0}
+        audited = []
+        failed = []
+        for scan_id, url, status, summary_json, error in scans:
+            if status == "failed":
+                failed.append({"scan_id": scan_id, "url": url, "error_message": error})
+                continue
+            summary = json.loads(summary_json) if summary_json else {}
+            for key in totals:
+                totals[key] += summary.get(key, 0)
+            audited.append({"scan_id": scan_id, "url": url, "summary": {k: summary.get(k, 0) for k in totals}})
+
+        worst = sorted(audited, key=lambda s: (s["summary"]["critical"], s["summary"]["serious"], s["summary"]["total"]), reverse=True)
+        return {
+            "batch_id": batch_id,
+            "scans": {"done": len(audited), "failed": len(failed), "with_issues": sum(1 for s in audited if s["summary"]["total"])},
+            "findings": totals,
+            "top_rules": [{"rule_id": rule, "count": n, "scans": n_scans} for rule, n, n_scans in rules],
+            "worst_scans": worst[:top_n],
+            "failed_scans": failed[:top_n],
+        }
+
+    @staticmethod
+    def delete_empty() -> int:
+        """Drop batches whose scans have all been purged."""
+        with get_session() as db:
+            n = db.execute(delete(Batch).where(~exists().where(Scan.batch_id == Batch.id))).rowcount
+            db.commit()
+            return n
+
+
+class ArtifactRepo:
+    @staticmethod
+    def set_refs(scan_id: int, kinds: tuple[str, ...], refs: list[dict]):
+        """Replace a scan's references of the given kinds (a retried scan re-registers its files)."""
+        now = datetime.utcnow()
+        with get_session() as db:
+            db.execute(delete(ArtifactRef).where(ArtifactRef.scan_id == scan_id, ArtifactRef.kind.in_(kinds)))
+            if refs:
+                blobs = {r["sha256"]: {"sha256": r["sha256"], "path": r["path"], "size": r["size"],
+                                       "created_at": now, "last_used_at": now} for r in refs}
+                stmt = sqlite_insert(Artifact).values(list(blobs.values()))
+                db.execute(stmt.on_conflict_do_update(
+                    index_elements=[Artifact.sha256], set_={"last_used_at": now, "path": stmt.excluded.path}
+                ))
+                db.execute(insert(ArtifactRef), [
+                    {"sha256": r["sha256"], "scan_id": scan_id, "kind": r["kind"], "name": r.get("name"),
+                     "page_id": r.get("page_id")} for r in refs
+                ])
+            db.commit()
+
+    @staticmethod
+    def total_bytes() -> int:
+        with get_session() as db:
+            return db.scalar(select(func.coalesce(func.sum(Artifact.size), 0)))
+
+    @staticmethod
+    def scan_refs(scan_ids: list[int]) -> list[tuple[int, str, int]]:
+        """(scan_id, sha256, size) for every artifact the scans reference."""
+        with get_session() as db:
+            return [tuple(r) for r in db.execute(
+                select(ArtifactRef.scan_id, ArtifactRef.sha256, Artifact.size)
+                .join(Artifact, Artifact.sha256 == ArtifactRef.sha256)
+                .where(ArtifactRef.scan_id.in_(scan_ids))
+            )]
+
+    @staticmethod
+    def viewport_refs(scan_id: int, viewport: str, kinds: tuple[str, ...]) -> list[dict]:
+        """A scan's references for one viewport, in the shape set_refs takes."""
+        with get_session() as db:
+            rows = db.execute(
+                select(ArtifactRef.sha256, Artifact.path, Artifact.size, ArtifactRef.kind, ArtifactRef.name, ArtifactRef.page_id)
+                .join(Artifact, Artifact.sha256 == ArtifactRef.sha256)
+                .where(ArtifactRef.scan_id == scan_id, ArtifactRef.name == viewport, ArtifactRef.kind.in_(kinds))
+            )
+            return [dict(r._mapping) for r in rows]
+
+    @staticmethod
+    def scan_artifacts(scan_id: int, kind: str) -> list[dict]:
+        with get_session() as db:
+            rows = db.execute(
+                select(Artifact.path, ArtifactRef.name, ArtifactRef.page_id)
+                .join(Artifact, Artifact.sha256 == ArtifactRef.sha256)
+                .where(ArtifactRef.scan_id == scan_id, ArtifactRef.kind == kind)
+                .order_by(ArtifactRef.id.asc())
+            )
+            return [dict(r._mapping) for r in rows]
+
+    @staticmethod
+    def scans_with_kind(kind: str, after_id: int = 0, limit: int = 500) -> list[int]:
+        """Done scans that reference artifacts of a kind, by id."""
+        with get_session() as db:
+            return list(db.scalars(
+                select(Scan.id)
+                .where(Scan.id > after_id, Scan.status == "done",
+                       exists().where(ArtifactRef.scan_id == Scan.id, ArtifactRef.kind == kind))
+                .order_by(Scan.id.asc())
+                .limit(limit)
+            ))
+
+    @staticmethod
+    def ref_counts(shas: list[str]) -> dict[str, int]:
+        with get_session() as db:
+            return dict(db.execute(
+                select(ArtifactRef.sha256, func.count()).where(ArtifactRef.sha256.in_(shas)).group_by(ArtifactRef.sha256)
+            ).all())
+
+    @staticmethod
+    def unreferenced(older_than: datetime, limit: int = 1000) -> list[dict]:
+        unused = ~exists().where(ArtifactRef.sha256 == Artifact.sha256)
+        with get_session() as db:
+            rows = db.execute(
+                select(Artifact.sha256, Artifact.path).where(unused, Artifact.last_used_at < older_than).limit(limit)
+            )
+            return [dict(r._mapping) for r in rows]
+
+    @staticmethod
+    def delete_unreferenced(shas: list[str], older_than: datetime) -> list[str]:
+        """Delete artifact rows that are still unreferenced and unused; returns the deleted hashes."""
+        if not shas:
+            return []
+        unused = ~exists().where(ArtifactRef.sha256 == Artifact.sha256)
+        with get_session() as db:
+            deleted = list(db.scalars(
+                delete(Artifact).where(Artifact.sha256.in_(shas), unused, Artifact.last_used_at < older_than)
+                .returning(Artifact.sha256)
+            ))
+            db.commit()
+            return deleted
+
+    @staticmethod
+    def known_hashes() -> set[str]:
+        with get_session() as db:
+            return set(db.scalars(select(Artifact.sha256)))
+
+
+class ResultCacheRepo:
+    @staticmethod
+    def get(key: str) -> dict | None:
+        """Cache entry whose source scan still exists and is done."""
+        with get_session() as db:
+            row = db.execute(
+                select(ResultCache.scan_id, Scan.screenshots_json)
+                .join(Scan, Scan.id == ResultCache.scan_id)
+                .where(ResultCache.key == key, Scan.status == "done")
+            ).first()
+            if not row:
+                return None
+            screenshots = json.loads(row.screenshots_json) if row.screenshots_json else {}
+            return {"scan_id": row.scan_id, "screenshots": screenshots}
+
+    @staticmethod
+    def put(entries: list[dict], scan_id: int):
+        """Point each key at scan_id (the newest valid source); hits are counted."""
+        if not entries:
+            return
+        now = datetime.utcnow()
+        with get_session() as db:
+            for e in entries:
+                hit = 1 if e["hit"] else 0
+                stmt = sqlite_insert(ResultCache).values(
+                    key=e["key"], url=e["url"], viewport=e["viewport"], scan_id=scan_id, created_at=now,
+                    last_hit_at=now if hit else None, hits=hit,
+                )
+                set_ = {"scan_id": scan_id}
+                if hit:
+                    set_.update(hits=ResultCache.hits + 1, last_hit_at=now)
+                db.execute(stmt.on_conflict_do_update(index_elements=[ResultCache.key], set_=set_))
+            db.commit()
+
+    @staticmethod
+    def stats() -> dict:
+        with get_session() as db:
+            entries, hits = db.execute(select(func.count(), func.coalesce(func.sum(ResultCache.hits), 0))).one()
+            by_status = dict(db.execute(
+                select(Scan.cache_status, func.count()).where(Scan.cache_status.is_not(None)).group_by(Scan.cache_status)
+            ).all())
+        return {"entries": entries, "hits": hits, "scans": by_status}
+
+
+class MetricsRepo:
+    @staticmethod
+    def stage_histograms(buckets: tuple[float, ...]) -> dict[str, dict]:
+        """Per stage: cumulative count of observations at or under each bucket, total count and sum."""
+        with get_session() as db:
+            rows = db.execute(
+                select(StageHistogram.stage, StageHistogram.le, StageHistogram.count, StageHistogram.sum_seconds)
+                .order_by(StageHistogram.stage, StageHistogram.le)
+            ).all()
+        per_stage: dict[str, list[tuple[float, int, float]]] = {}
+        for stage, le, count, total in rows:
+            per_stage.setdefault(stage, []).append((le, count, total))
+        return {
+            stage: {
+                "count": sum(n for _, n, _ in counts),
+                "sum": sum(t for _, _, t in counts),
+                "buckets": [(b, sum(n for le, n, _ in counts if le <= b)) for b in buckets],
+            }
+            for stage, counts in per_stage.items()
+        }
+
+    @staticmethod
+    def scan_counts() -> dict[tuple[str, str], int]:
+        """Scans per (status, scan_type)."""
+        with get_session() as db:
+            rows = db.execute(select(Scan.status, Scan.scan_type, func.count()).group_by(Scan.status, Scan.scan_type)).all()
+        return {(status, scan_type): n for status, scan_type, n in rows}
+
+    @staticmethod
+    def oldest_queued_age() -> float:
+        with get_session() as db:
+            oldest = db.execute(select(func.min(Scan.created_at)).where(Scan.status == "queued")).scalar()
+        return (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0
+
+    @staticmethod
+    def worker_heartbeat(worker_id: str, started_at: datetime, **counters):
+        now = datetime.utcnow()
+        stmt = sqlite_insert(WorkerStats).values(worker_id=worker_id, started_at=started_at, heartbeat_at=now, **counters)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[WorkerStats.worker_id], set_={"started_at": started_at, "heartbeat_at": now, **counters},
+        )
+        with get_session() as db:
+            db.execute(stmt)
+            db.commit()
+
+    @staticmethod
+    def workers(seen_within_seconds: int) -> list[dict]:
+        cutoff = datetime.utcnow() - timedelta(seconds=seen_within_seconds)
+        with get_session() as db:
+            rows = db.execute(select(WorkerStats).where(WorkerStats.heartbeat_at >= cutoff).order_by(WorkerStats.worker_id)).scalars()
+            return [
+                {
+                    "worker_id": w.worker_id,
+                    "heartbeat_at": w.heartbeat_at,
+                    "in_flight": w.in_flight,
+                    "scans_finished": w.scans_finished,
+                    "scans_errored": w.scans_errored,
+                    "browser_launches": w.browser_launches,
+                }
+                for w in rows
+            ]
+
+    @staticmethod
+    def delete_stale_workers(older_than: datetime) -> int:
+        with get_session() as db:
+            n = db.execute(delete(WorkerStats).where(WorkerStats.heartbeat_at < older_than)).rowcount
+            db.commit()
+            return n
+
+
+class RobotsCacheRepo:
+    @staticmethod
+    def get(origin: str) -> dict | None:
+        with get_session() as db:
+            row = db.get(RobotsCache, origin)
+            if not row:
+                return None
+            return {
+                "origin": row.origin,
+                "status": row.status,
+                "status_code": row.status_code,
+                "body": row.body,
+                "etag": row.etag,
+                "last_modified": row.last_modified,
+                "fetched_at": row.fetched_at,
+                "expires_at": row.expires_at,
+                "hits": row.hits,
+            }
+
+    @staticmethod
+    def record_hit(origin: str):
+        with get_session() as db:
+            db.execute(update(RobotsCache).where(RobotsCache.origin == origin).values(hits=RobotsCache.hits + 1))
+            db.commit()
+
+    @staticmethod
+    def upsert(origin: str, outcome: str, **values):
+        """Store a fetch result; outcome (fetches/revalidations/errors) names the counter to bump."""
+        counter = getattr(RobotsCache, outcome)
+        with get_session() as db:
+            stmt = sqlite_insert(RobotsCache).values(origin=origin, **values, **{outcome: 1})
+            db.execute(stmt.on_conflict_do_update(index_elements=[RobotsCache.origin], set_={**values, outcome: counter + 1}))
+            db.commit()
+
+    @staticmethod
+    def stats() -> dict:
+        """Lookups across all processes: served from the DB cache vs network requests by outcome."""
+        with get_session() as db:
+            origins, hits, fetches, revalidations, errors = db.execute(select(
+                func.count(),
+                *(func.coalesce(func.sum(c), 0) for c in (
+                    RobotsCache.hits, RobotsCache.fetches, RobotsCache.revalidations, RobotsCache.errors,
+                )),
+            )).one()
+        return {"origins": origins, "hits": hits, "fetches": fetches, "revalidations": revalidations, "errors": errors}
+
+
+class HostLimitRepo:
+    @staticmethod
+    def acquire(host: str, interval: float, burst: int) -> float:
+        """Take one request token for host (GCRA); returns 0, or the seconds until one is available.
+
+        Runs as a single upsert, so workers in different processes share the limit.
+        """
+        now = time.time()
+        tolerance = interval * (max(1, burst) - 1)
+        stmt = sqlite_insert(HostLimit).values(host=host, tat=now + interval, tolerance=tolerance, updated_at=datetime.utcnow())
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[HostLimit.host],
+            set_={"tat": func.max(HostLimit.tat, now) + interval, "tolerance": tolerance, "updated_at": datetime.utcnow()},
+            where=HostLimit.tat - tolerance <= now,
+        ).returning(HostLimit.tat)
+        with get_session() as db:
+            if db.execute(stmt).first() is not None:
+                db.commit()
+                return 0.0
+            tat = db.execute(select(HostLimit.tat).where(HostLimit.host == host)).scalar()
+        return max(0.0, (tat or now) - tolerance - now)
+
+
+class SettleStatsRepo:
+    @staticmethod
+    def get(host: str) -> dict | None:
+        with get_session() as db:
+            row = db.get(HostSettleStats, host)
+            if not row:
+                return None
+            return {"host": row.host, "samples": row.samples, "ewma_ms": row.ewma_ms, "last_ms": row.last_ms, "timeouts": row.timeouts}
+
+    @staticmethod
+    def record(host: str, settle_ms: float, timed_out: bool, alpha: float):
+        """Fold one settle time into the host's exponentially weighted moving average."""
+        now = datetime.utcnow()
+        stmt = sqlite_insert(HostSettleStats).values(
+            host=host, samples=1, ewma_ms=settle_ms, last_ms=settle_ms, timeouts=int(timed_out), updated_at=now,
+        )
+        # Computed in the UPDATE so concurrent workers don't lose samples
+        set_ = {
+            "samples": HostSettleStats.samples + 1,
+            "ewma_ms": HostSettleStats.ewma_ms + alpha * (stmt.excluded.ewma_ms - HostSettleStats.ewma_ms),
+            "last_ms": stmt.excluded.last_ms,
+            "timeouts": HostSettleStats.timeouts + stmt.excluded.timeouts,
+            "updated_at": now,
+        }
+        with get_session() as db:
+            db.execute(stmt.on_conflict_do_update(index_elements=[HostSettleStats.host], set_=set_))
+            db.commit()
+
+
+class MaintenanceLeaseRepo:
+    @staticmethod
+    def acquire(name: str, holder: str, seconds: int) -> bool:
+        """Take (or renew) the named lease unless another holder's lease is still running."""
+        now = datetime.utcnow()
+        stmt = sqlite_insert(MaintenanceLease).values(name=name, holder=holder, expires_at=now + timedelta(seconds=seconds))
+        with get_session() as db:
+            won = db.execute(stmt.on_conflict_do_update(
+                index_elements=[MaintenanceLease.name],
+                set_={"holder": stmt.excluded.holder, "expires_at": stmt.excluded.expires_at},
+                where=or_(MaintenanceLease.expires_at < now, MaintenanceLease.holder == holder),
+            ).returning(MaintenanceLease.name)).first()
+            db.commit()
+        return won is not None
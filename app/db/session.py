@@ -1,7 +1,8 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
 from app.db.models import Base
+from app.db.migrations import upgrade_schema
 
 _engine = None
 SessionLocal = None
@@ -12,13 +13,25 @@ def get_engine():
         # check_same_thread needed for SQLite with worker+api
         connect_args = {"check_same_thread": False} if settings.database_url.startswith("sqlite") else {}
         _engine = create_engine(settings.database_url, connect_args=connect_args, future=True)
+        if settings.database_url.startswith("sqlite"):
+            event.listen(_engine, "connect", _sqlite_pragmas)
     return _engine
 
+def _sqlite_pragmas(dbapi_conn, _):
+    # WAL lets the API read while a worker writes; busy_timeout makes concurrent
+    # writers wait for the lock instead of failing with "database is locked".
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.close()
+
 def init_db():
     global SessionLocal
     engine = get_engine()
     SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
     Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
 
 def get_session():
     if SessionLocal is None:
@@ -0,0 +1,34 @@
+# Third-party hosts that only serve analytics, ads, tag managers or chat widgets.
+# Matched against the request host and all its parent domains.
+TRACKER_DOMAINS = {
+    # analytics / tag managers
+    "google-analytics.com", "googletagmanager.com", "analytics.google.com", "stats.g.doubleclick.net",
+    "matomo.cloud", "plausible.io", "segment.io", "cdn.segment.com", "api-js.mixpanel.com", "cdn.mxpnl.com",
+    "api.amplitude.com", "cdn.amplitude.com", "heapanalytics.com", "fullstory.com", "hotjar.com", "hotjar.io",
+    "clarity.ms", "mouseflow.com", "crazyegg.com", "js-agent.newrelic.com", "nr-data.net", "etracker.com",
+    "etracker.de", "econda-monitor.de", "webtrekk.net", "wt-safetag.com",
+    # ads
+    "doubleclick.net", "googlesyndication.com", "googleadservices.com", "adservice.google.com",
+    "amazon-adsystem.com", "criteo.com", "criteo.net", "taboola.com", "outbrain.com", "adnxs.com",
+    "bat.bing.com", "ads.linkedin.com", "snap.licdn.com",
+    # social pixels
+    "connect.facebook.net", "facebook.net", "analytics.tiktok.com", "ct.pinterest.com", "static.ads-twitter.com",
+    # chat / support widgets
+    "widget.intercom.io", "api-iam.intercom.io", "intercomcdn.com", "zdassets.com", "zopim.com",
+    "driftt.com", "client.crisp.chat", "embed.tawk.to", "cdn.livechatinc.com", "hs-scripts.com",
+    "hs-analytics.net",
+}
+
+# name -> (Playwright resource types to block, block tracker domains)
+BLOCK_PROFILES: dict[str, tuple[frozenset[str], bool]] = {
+    "none": (frozenset(), False),
+    "trackers": (frozenset(), True),
+    "media": (frozenset({"media"}), True),
+    "lean": (frozenset({"media", "font"}), True),
+}
+
+
+def is_tracker(host: str) -> bool:
+    host = host.lower().rstrip(".")
+    parts = host.split(".")
+    return any(".".join(parts[i:]) in TRACKER_DOMAINS for i in range(len(parts) - 1))
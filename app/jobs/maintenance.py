@@ -0,0 +1,198 @@
+import argparse
+import os
+import shutil
+import socket
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from sqlalchemy import text
+
+from app.config import settings
+from app.db.session import init_db, get_engine
+from app.db.repo import ScanRepo, ArtifactRepo, MetricsRepo, BatchRepo, MaintenanceLeaseRepo
+from app.core.metrics import WORKER_STATS_MAX_AGE_SECONDS
+from app.core.artifacts import cas_root, remove, remove_stale
+from app.scanners.http_cache import cache_root as http_cache_root
+
+# VACUUM rewrites the whole file; only worth it once this share of pages is free
+VACUUM_MIN_FREE_RATIO = 0.25
+# Only the process holding this lease vacuums, at most once per MAINTENANCE_INTERVAL_SECONDS
+VACUUM_LEASE = "vacuum"
+LEASE_HOLDER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _over_budget_scan_ids(budget_bytes: int) -> list[int]:
+    """Oldest finished scans whose removal brings the artifact store under budget."""
+    excess = ArtifactRepo.total_bytes() - budget_bytes
+    chosen: list[int] = []
+    refs_left: dict[str, int] = {}
+    after_id = 0
+    while excess > 0:
+        batch = ScanRepo.oldest_finished_scan_ids(after_id)
+        if not batch:
+            break
+        after_id = batch[-1]
+        by_scan: dict[int, list[tuple[str, int]]] = {}
+        for scan_id, sha, size in ArtifactRepo.scan_refs(batch):
+            by_scan.setdefault(scan_id, []).append((sha, size))
+        new = {sha for refs in by_scan.values() for sha, _ in refs} - refs_left.keys()
+        if new:
+            refs_left.update(ArtifactRepo.ref_counts(list(new)))
+        for scan_id in batch:
+            if excess <= 0:
+                break
+            chosen.append(scan_id)
+            for sha, size in by_scan.get(scan_id, []):
+                refs_left[sha] -= 1
+                if refs_left[sha] == 0:
+                    # Last reference gone: the blob will be collected
+                    excess -= size
+    return chosen
+
+
+def _remove_scan_dirs(scan_ids: list[int]):
+    base = Path(settings.artifacts_dir)
+    for scan_id in scan_ids:
+        # reports/<id> and the per-scan screenshot folders of older versions
+        for sub in ("reports", "screenshots"):
+            shutil.rmtree(base / sub / str(scan_id), ignore_errors=True)
+
+
+def purge_scans() -> dict:
+    """Apply the retention policy: max age, max scans per URL, then the size budget."""
+    expired = ScanRepo.expired_scan_ids(settings.retention_max_age_days, settings.retention_max_scans_per_url)
+    purged = ScanRepo.purge_scans(expired)
+    _remove_scan_dirs(expired)
+
+    over_budget: list[int] = []
+    if settings.artifacts_max_mb:
+        over_budget = _over_budget_scan_ids(settings.artifacts_max_mb * 1024 * 1024)
+        purged += ScanRepo.purge_scans(over_budget)
+        _remove_scan_dirs(over_budget)
+    return {"scans_purged": purged, "expired": len(expired), "over_budget": len(over_budget)}
+
+
+def _old(path: str, cutoff: float) -> bool:
+    try:
+        return os.path.getmtime(path) < cutoff
+    except FileNotFoundError:
+        return False
+
+
+def collect_garbage() -> dict:
+    """Delete unreferenced artifacts, orphan files, stale cached reports and expired HTTP cache entries."""
+    grace = settings.artifact_gc_grace_seconds
+    cutoff = time.time() - grace
+    freed = 0
+    blobs = 0
+
+    # Unreferenced blobs. The row delete re-checks references in its own
+    # transaction; a blob a running scan re-stored (put_bytes touches it) but has
+    # not referenced yet keeps its file, and set_refs recreates the row.
+    older_than = datetime.utcnow() - timedelta(seconds=grace)
+    while True:
+        candidates = [a for a in ArtifactRepo.unreferenced(older_than) if _old(a["path"], cutoff)]
+        deleted = set(ArtifactRepo.delete_unreferenced([a["sha256"] for a in candidates], older_than))
+        for a in candidates:
+            if a["sha256"] in deleted:
+                size = remove_stale(a["path"], cutoff)
+                freed += size
+                blobs += bool(size)
+        if not deleted:
+            break
+
+    # Files in the store without a row (scans that failed or never finished) and leftover temp files
+    orphans = 0
+    root = cas_root()
+    if root.exists():
+        known = ArtifactRepo.known_hashes()
+        for dirpath, _, files in os.walk(root):
+            for name in files:
+                path = os.path.join(dirpath, name)
+                if not _old(path, cutoff):
+                    continue
+                if name.endswith(".tmp"):
+                    size = remove(path)
+                elif name.split(".", 1)[0] not in known:
+                    size = remove_stale(path, cutoff)
+                else:
+                    continue
+                freed += size
+                orphans += bool(size)
+
+    # Cached reports of purged scans, and superseded renders of live ones
+    reports = 0
+    reports_dir = Path(settings.artifacts_dir) / "reports"
+    if reports_dir.exists():
+        dirs = {int(d.name): d for d in reports_dir.iterdir() if d.is_dir() and d.name.isdigit()}
+        current = ScanRepo.report_paths(list(dirs))
+        for scan_id, d in dirs.items():
+            if scan_id not in current:
+                shutil.rmtree(d, ignore_errors=True)
+                reports += 1
+                continue
+            for f in d.iterdir():
+                if str(f) != current[scan_id] and _old(str(f), cutoff):
+                    freed += remove(str(f))
+                    reports += 1
+
+    # Expired HTTP cache entries (they are never served again, only overwritten)
+    http_expired = 0
+    root = http_cache_root()
+    if root.exists():
+        http_cutoff = time.time() - max(settings.http_cache_ttl_seconds, grace)
+        for dirpath, _, files in os.walk(root):
+            for name in files:
+                path = os.path.join(dirpath, name)
+                if _old(path, http_cutoff):
+                    freed += remove(path)
+                    http_expired += 1
+
+    return {
+        "blobs_deleted": blobs, "orphans_deleted": orphans, "reports_deleted": reports,
+        "http_cache_deleted": http_expired, "bytes_freed": freed,
+    }
+
+
+def vacuum(force: bool = False) -> dict:
+    """Checkpoint the WAL and VACUUM when enough of the file is free pages.
+
+    VACUUM holds the write lock for the whole rewrite, so with several workers
+    only the one holding the vacuum lease runs it (force skips the lease).
+    """
+    engine = get_engine()
+    if engine.dialect.name != "sqlite":
+        return {"vacuumed": False}
+    if not force and not MaintenanceLeaseRepo.acquire(VACUUM_LEASE, LEASE_HOLDER, settings.maintenance_interval_seconds or 3600):
+        return {"vacuumed": False, "vacuum_lease": False}
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        pages = conn.execute(text("PRAGMA page_count")).scalar() or 0
+        free = conn.execute(text("PRAGMA freelist_count")).scalar() or 0
+        run = bool(pages) and (force or free / pages >= VACUUM_MIN_FREE_RATIO)
+        if run:
+            conn.execute(text("VACUUM"))
+        conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+    return {"vacuumed": run, "free_pages": free, "pages": pages}
+
+
+def run_maintenance(force_vacuum: bool = False) -> dict:
+    stats = purge_scans()
+    stats["batches_deleted"] = BatchRepo.delete_empty()
+    stats["workers_pruned"] = MetricsRepo.delete_stale_workers(
+        datetime.utcnow() - timedelta(seconds=WORKER_STATS_MAX_AGE_SECONDS)
+    )
+    stats.update(collect_garbage())
+    stats.update(vacuum(force_vacuum))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply retention, collect unused artifacts and compact the database.")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM even if little space would be reclaimed")
+    args = parser.parse_args()
+    init_db()
+    print(run_maintenance(force_vacuum=args.vacuum))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
+
+from app.db.session import init_db
+from app.db.repo import ScanRepo, ArtifactRepo
+from app.core.axe_archive import load_raw, AXE_RAW_KIND
+from app.core.normalize import normalize_axe_results, merge_viewports, summarize_findings, summarize_site
+
+
+def _normalize_job(job: dict) -> dict:
+    """Re-derive one scan's findings from its archived axe output (runs in a worker process, no DB)."""
+    by_page: dict[int | None, list[dict]] = {}
+    for raw in job["raws"]:
+        page = job["pages"].get(raw["page_id"]) if raw["page_id"] is not None else None
+        shot = job["screenshots"].get(raw["name"]) if page is None or page["depth"] == 0 else None
+        by_page.setdefault(raw["page_id"], []).extend(normalize_axe_results(
+            load_raw(raw["path"]),
+            viewport_name=raw["name"],
+            screenshot_path=shot,
+            page_id=raw["page_id"],
+            page_url=page["url"] if page else None,
+        ))
+    findings: list[dict] = []
+    page_summaries: dict[int, dict] = {}
+    for page_id, page_findings in by_page.items():
+        merged = merge_viewports(page_findings)
+        if page_id is not None:
+            page_summaries[page_id] = summarize_findings(merged)
+        findings.extend(merged)
+    return {"scan_id": job["scan_id"], "findings": findings, "page_summaries": page_summaries}
+
+
+def _build_job(scan_id: int) -> dict | None:
+    scan = ScanRepo.get_scan(scan_id)
+    raws = ArtifactRepo.scan_artifacts(scan_id, AXE_RAW_KIND)
+    if not scan or not raws:
+        return None
+    pages = {p["id"]: p for p in ScanRepo.list_pages(scan_id)} if scan["scan_type"] == "crawl" else {}
+    screenshots = {
+        name: shot if isinstance(shot, str) else shot.get("path")
+        for name, shot in (scan.get("screenshots") or {}).items()
+    }
+    return {"scan_id": scan_id, "scan": scan, "raws": raws, "pages": pages, "screenshots": screenshots}
+
+
+def _store(job: dict, result: dict):
+    scan = job["scan"]
+    findings = result["findings"]
+    if scan["scan_type"] == "crawl":
+        pages = []
+        for p in job["pages"].values():
+            summary = result["page_summaries"].get(p["id"], p["summary"]) if p["status"] == "done" else None
+            pages.append({"id": p["id"], "url": p["url"], "status": p["status"], "summary": summary})
+        summary = summarize_site(pages, findings)
+        previous = (scan.get("summary") or {}).get("pages") or {}
+        summary["pages"]["frontier_dropped"] = previous.get("frontier_dropped", 0)
+        summary["pages"]["frontier_rejected"] = previous.get("frontier_rejected", 0)
+    else:
+        summary = summarize_findings(findings)
+    ScanRepo.replace_results(job["scan_id"], findings, summary, result["page_summaries"])
+
+
+def _scan_ids(scan_ids: list[int] | None):
+    if scan_ids:
+        yield from scan_ids
+        return
+    after_id = 0
+    while True:
+        batch = ArtifactRepo.scans_with_kind(AXE_RAW_KIND, after_id)
+        if not batch:
+            return
+        yield from batch
+        after_id = batch[-1]
+
+
+def renormalize(scan_ids: list[int] | None = None, workers: int | None = None) -> int:
+    """Re-run normalization, hints and summaries over archived raw axe results.
+
+    Parsing and normalizing run in a process pool; results are written back from
+    this process, one transaction per scan, since SQLite has a single writer.
+    """
+    workers = workers or os.cpu_count() or 1
+    done = 0
+    pending: dict = {}
+
+    def drain(return_when):
+        nonlocal done
+        finished, _ = wait(pending, return_when=return_when)
+        for fut in finished:
+            job = pending.pop(fut)
+            result = fut.result()
+            _store(job, result)
+            done += 1
+            print(f"Scan {job['scan_id']}: {len(result['findings'])} finding(s)")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for scan_id in _scan_ids(scan_ids):
+            job = _build_job(scan_id)
+            if job is None:
+                continue
+            pending[executor.submit(_normalize_job, job)] = job
+            # Keep a bounded number of scans in memory
+            if len(pending) >= 4 * workers:
+                drain(FIRST_COMPLETED)
+        if pending:
+            drain(ALL_COMPLETED)
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-normalize archived axe results without opening a browser.")
+    parser.add_argument("scan_ids", nargs="*", type=int, help="Scans to process (default: every scan with an archive)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+    init_db()
+    print(f"Re-normalized {renormalize(args.scan_ids or None, args.workers)} scan(s)")
+
+
+if __name__ == "__main__":
+    main()
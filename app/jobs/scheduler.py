@@ -1,4 +1,61 @@
-from app.db.repo import ScanRepo
+from app.config import settings
+from app.core.urls import canonicalize_url
+from app.db.repo import ScanRepo, BatchRepo
 
-def enqueue_scan(url: str) -> int:
-    return ScanRepo.create_scan(url)
+def coalesce_key(
+    url: str,
+    mode: str = "page",
+    max_pages: int | None = None,
+    max_depth: int | None = None,
+    use_sitemap: bool | None = None,
+    force_refresh: bool = False,
+) -> str:
+    """Requests with the same key would produce the same scan."""
+    # force_refresh scans never take findings from the result cache
+    prefix = "refresh " if force_refresh else ""
+    if mode != "crawl":
+        return prefix + canonicalize_url(url)
+    # Crawl options as the crawler resolves them, so omitted and explicit defaults match
+    pages = max_pages or settings.crawl_max_pages
+    depth = max_depth if max_depth is not None else settings.crawl_max_depth
+    sitemap = use_sitemap if use_sitemap is not None else True
+    return f"{prefix}crawl:{pages}:{depth}:{int(sitemap)} {canonicalize_url(url)}"
+
+def enqueue_scan(
+    url: str,
+    mode: str = "page",
+    max_pages: int | None = None,
+    max_depth: int | None = None,
+    use_sitemap: bool | None = None,
+    force_refresh: bool = False,
+    force: bool = False,
+) -> tuple[int, bool]:
+    """Queue a scan, or return an equivalent queued/running one (or a recent result unless force).
+
+    Returns (scan_id, coalesced). force_refresh implies force, and only joins
+    scans that were queued with force_refresh too; a plain request joins either.
+    """
+    window = 0 if force or force_refresh else settings.scan_reuse_window_seconds
+    options = (url, mode, max_pages, max_depth, use_sitemap)
+    return ScanRepo.create_or_get_scan(
+        url, coalesce_key(*options, force_refresh=force_refresh), reuse_window_seconds=window,
+        also_join=() if force_refresh else (coalesce_key(*options, force_refresh=True),),
+        scan_type=mode, max_pages=max_pages, max_depth=max_depth, use_sitemap=use_sitemap, force_refresh=force_refresh,
+    )
+
+def enqueue_batch(
+    urls: list[str],
+    mode: str = "page",
+    name: str | None = None,
+    duplicates: int = 0,
+    rejected: int = 0,
+    max_pages: int | None = None,
+    max_depth: int | None = None,
+    use_sitemap: bool | None = None,
+    force_refresh: bool = False,
+) -> int:
+    keys = [coalesce_key(u, mode, max_pages, max_depth, use_sitemap, force_refresh) for u in urls]
+    return BatchRepo.create_batch(
+        urls, scan_type=mode, name=name, coalesce_keys=keys, duplicates=duplicates, rejected=rejected,
+        max_pages=max_pages, max_depth=max_depth, use_sitemap=use_sitemap, force_refresh=force_refresh,
+    )
@@ -1,27 +1,192 @@
-import time
+import asyncio
+import os
+import signal
+import socket
 import traceback
+from datetime import datetime
 
+from app.config import settings
 from app.db.session import init_db
-from app.db.repo import ScanRepo
-from app.core.scan_service import run_scan_job
+from app.db.repo import ScanRepo, MetricsRepo, LeaseLost
+from app.core.scan_service import run_scan_job_async
+from app.jobs.maintenance import run_maintenance
+from app.scanners.browser_pool import BrowserPool
 
-POLL_SECONDS = 1.5
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+# Retry delay after a failed DB call (e.g. "database is locked"), doubling up to the loop's own interval
+DB_RETRY_MIN_SECONDS = 1.0
 
-def main():
-    init_db()
-    print("Worker started. Polling for queued scans...")
+class _State:
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.pending: asyncio.Queue[int] = asyncio.Queue()
+        self.in_flight: set[int] = set()
+        # Claimed by this worker and not finished yet (pending or in flight)
+        self.claimed: set[int] = set()
+        self.stop = asyncio.Event()
+        # Set when a slot frees up so the claimer doesn't sit out its backoff
+        self.wake = asyncio.Event()
+        self.started_at = datetime.utcnow()
+        self.scans_finished = 0
+        self.scans_errored = 0
+
+async def _sleep_until(event: asyncio.Event, timeout: float):
+    try:
+        await asyncio.wait_for(event.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        pass
+
+async def _run_one(state: _State, scan_id: int, pool: BrowserPool):
+    try:
+        await run_scan_job_async(scan_id, pool, WORKER_ID)
+        state.scans_finished += 1
+    except LeaseLost:
+        # Requeued while we were stalled; the new owner's run is the one that counts
+        state.scans_errored += 1
+        print(f"Lease on scan {scan_id} lost; result dropped")
+    except Exception as e:
+        state.scans_errored += 1
+        traceback.print_exc()
+        try:
+            await asyncio.to_thread(ScanRepo.set_scan_failed, scan_id, error_message=str(e), worker_id=WORKER_ID)
+        except Exception:
+            # The lease runs out and another worker retries the scan
+            traceback.print_exc()
+
+async def _runner(state: _State, pool: BrowserPool):
+    while not state.stop.is_set():
+        get = asyncio.ensure_future(state.pending.get())
+        stopped = asyncio.ensure_future(state.stop.wait())
+        done, _ = await asyncio.wait({get, stopped}, return_when=asyncio.FIRST_COMPLETED)
+        if get not in done:
+            get.cancel()
+            return
+        stopped.cancel()
+        scan_id = get.result()
+        state.in_flight.add(scan_id)
+        try:
+            await _run_one(state, scan_id, pool)
+        finally:
+            state.in_flight.discard(scan_id)
+            state.claimed.discard(scan_id)
+            state.wake.set()
 
+async def _heartbeat(state: _State, pool: BrowserPool):
+    interval = max(1.0, settings.job_lease_seconds / 3)
+    retry = DB_RETRY_MIN_SECONDS
     while True:
-        scan_id = ScanRepo.claim_next_queued_scan()
-        if scan_id is None:
-            time.sleep(POLL_SECONDS)
+        try:
+            await asyncio.to_thread(ScanRepo.heartbeat, WORKER_ID, list(state.claimed))
+            retry = DB_RETRY_MIN_SECONDS
+        except Exception:
+            # Keep trying well before the leases run out
+            traceback.print_exc()
+            await asyncio.sleep(retry)
+            retry = min(retry * 2, interval)
             continue
+        try:
+            # Counters for /metrics
+            await asyncio.to_thread(
+                MetricsRepo.worker_heartbeat, WORKER_ID, state.started_at, in_flight=len(state.claimed),
+                scans_finished=state.scans_finished, scans_errored=state.scans_errored,
+                browser_launches=pool.launches,
+            )
+        except Exception:
+            traceback.print_exc()
+        await asyncio.sleep(interval)
 
+async def _maintenance():
+    # Retention and artifact GC are safe to run from several workers at once; VACUUM takes a lease
+    while True:
+        await asyncio.sleep(settings.maintenance_interval_seconds)
         try:
-            run_scan_job(scan_id)
-        except Exception as e:
+            stats = await asyncio.to_thread(run_maintenance)
+            print(f"Maintenance: {stats}")
+        except Exception:
             traceback.print_exc()
-            ScanRepo.set_scan_failed(scan_id, error_message=str(e))
+
+async def _claimer(state: _State):
+    loop = asyncio.get_running_loop()
+    delay = settings.poll_min_seconds
+    next_reap = 0.0
+    retry = DB_RETRY_MIN_SECONDS
+    while not state.stop.is_set():
+        free = state.concurrency - len(state.in_flight) - state.pending.qsize()
+        claimed = 0
+        try:
+            if loop.time() >= next_reap:
+                requeued = await asyncio.to_thread(ScanRepo.requeue_expired_leases)
+                if requeued:
+                    print(f"Requeued {requeued} scan(s) with expired leases")
+                next_reap = loop.time() + settings.job_lease_seconds / 2
+
+            for _ in range(max(0, free)):
+                scan_id = await asyncio.to_thread(ScanRepo.claim_next_queued_scan, WORKER_ID)
+                if scan_id is None:
+                    break
+                state.claimed.add(scan_id)
+                state.pending.put_nowait(scan_id)
+                claimed += 1
+            retry = DB_RETRY_MIN_SECONDS
+        except Exception:
+            # In-flight scans keep running; try again after a pause
+            traceback.print_exc()
+            await _sleep_until(state.stop, retry)
+            retry = min(retry * 2, settings.poll_max_seconds)
+            continue
+
+        if claimed:
+            delay = settings.poll_min_seconds
+            # Let runners pick up the new work before claiming again
+            await asyncio.sleep(0)
+            continue
+
+        # Nothing claimable (queue empty or all slots busy): back off exponentially,
+        # but wake early on shutdown or when a slot frees up.
+        state.wake.clear()
+        await _sleep_until(state.wake if free <= 0 else state.stop, delay)
+        if free > 0:
+            delay = min(delay * 2, settings.poll_max_seconds)
+
+async def _main():
+    init_db()
+    concurrency = max(1, settings.worker_concurrency)
+    print(f"Worker {WORKER_ID} started (concurrency={concurrency}). Polling for queued scans...")
+
+    state = _State(concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, lambda: (state.stop.set(), state.wake.set()))
+        except NotImplementedError:
+            pass
+
+    # One browser pool for the lifetime of the process, shared by all in-flight scans
+    pool = BrowserPool()
+    await pool.start()
+    try:
+        runners = [asyncio.create_task(_runner(state, pool)) for _ in range(concurrency)]
+        background = [asyncio.create_task(_heartbeat(state, pool))]
+        if settings.maintenance_interval_seconds > 0:
+            background.append(asyncio.create_task(_maintenance()))
+        await _claimer(state)
+
+        print("Shutting down: waiting for in-flight scans to finish...")
+        await asyncio.gather(*runners)
+        for task in background:
+            task.cancel()
+    finally:
+        # Give back anything claimed but not started so another worker can take it
+        unstarted = []
+        while not state.pending.empty():
+            unstarted.append(state.pending.get_nowait())
+        if unstarted:
+            await asyncio.to_thread(ScanRepo.requeue_scans, unstarted)
+            print(f"Requeued {len(unstarted)} unstarted scan(s): {unstarted}")
+        await pool.close()
+
+def main():
+    asyncio.run(_main())
 
 if __name__ == "__main__":
     main()
@@ -3,13 +3,18 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.units import mm
 from reportlab.lib.utils import ImageReader
 from reportlab.lib import colors
-from reportlab.platypus import Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import LongTable, TableStyle, Paragraph, Frame, Spacer
+from reportlab.platypus.doctemplate import LayoutError
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from xml.sax.saxutils import escape
 from reportlab.pdfbase.pdfmetrics import stringWidth
 from datetime import datetime
 import os
 
 
+# Bump when the report layout changes; cached PDFs are keyed by it
+REPORT_TEMPLATE_VERSION = 5
+
 # ------------------------------
 # Styles for wrapped cells
 # ------------------------------
@@ -29,6 +34,24 @@ SELECTOR_STYLE.leading = 10
 SELECTOR_STYLE.spaceBefore = 0
 SELECTOR_STYLE.spaceAfter = 0
 
+RULE_HEADING_STYLE = ParagraphStyle(
+    "RuleHeading", parent=_STYLES["Heading4"], fontName="Helvetica-Bold", fontSize=10, leading=13,
+    spaceBefore=8, spaceAfter=2, textColor=colors.HexColor("#0F172A"),
+)
+RULE_BODY_STYLE = ParagraphStyle(
+    "RuleBody", parent=_STYLES["BodyText"], fontName="Helvetica", fontSize=8, leading=10,
+    spaceBefore=0, spaceAfter=3, textColor=colors.HexColor("#334155"),
+)
+
+# Rows per findings table. Tables are split across pages row by row; keeping each
+# table small bounds the cost of every split, so layout stays linear in findings.
+FINDINGS_CHUNK_ROWS = 100
+# Text shown per selector/element cell (the API has the full value); keeps every row well under a page
+MAX_CELL_CHARS = 300
+CELL_FONT, CELL_FONT_SIZE, CELL_LEADING = "Helvetica", 8, 10
+
+SEVERITY_ORDER = {"critical": 0, "serious": 1, "moderate": 2, "minor": 3}
+
 
 def _draw_header(c: canvas.Canvas, title: str, subtitle: str | None = None):
     width, height = A4
@@ -171,29 +194,69 @@ def build_pdf(
         c.showPage()
 
     # ------------------------------
-    # Findings table (readable + wrapped Fix hint)
+    # Findings, grouped by rule, flowed in one pass
     # ------------------------------
-    _draw_header(c, "Findings", "Top issues (first 50 nodes)")
-    c.setFillColor(colors.HexColor("#0F172A"))
-    c.setFont("Helvetica", 10)
-    c.drawString(18 * mm, height - 42 * mm, "Below are the most actionable findings (limited to 50).")
+    def new_frame(subtitle: str) -> Frame:
+        _draw_header(c, "Findings", subtitle)
+        return Frame(18 * mm, 18 * mm, width - 36 * mm, height - 58 * mm, leftPadding=0, rightPadding=0,
+                     topPadding=0, bottomPadding=0, showBoundary=0)
 
-    rows = [["#", "Severity", "Rule", "Viewport", "Selector", "Fix hint"]]
+    _flow(c, _findings_flowables(findings), new_frame)
+    c.save()
 
-    for i, f in enumerate(findings[:50], start=1):
-        sev = (f.get("impact") or "moderate").lower()
-        rule = f.get("rule_id") or ""
-        vp = f.get("viewport") or ""
 
-        sel_text = (f.get("selector") or "").replace("\n", "<br/>").strip()
-        hint_text = (f.get("fix_hint") or "").replace("\n", "<br/>").strip()
+def _para(text: str | None, style) -> Paragraph:
+    text = escape((text or "").strip()).replace("\n", "<br/>")
+    return Paragraph(text if text else "&nbsp;", style)
+
 
-        # Wrap selector and fix hint to avoid table width growth
-        sel_para = Paragraph(sel_text if sel_text else "&nbsp;", SELECTOR_STYLE)
-        hint_para = Paragraph(hint_text if hint_text else "&nbsp;", FIX_HINT_STYLE)
+def _wrap_cell(text: str | None, width: float) -> str:
+    """Plain text broken into lines that fit width.
 
-        rows.append([str(i), sev, rule, vp, sel_para, hint_para])
+    Cheaper than a Paragraph, whose lines are re-broken on every wrap and split
+    of its table. Words wider than the cell (selectors, URLs) break anywhere.
+    """
+    text = " ".join((text or "").split())
+    if len(text) > MAX_CELL_CHARS:
+        text = text[:MAX_CELL_CHARS] + "…"
+    lines: list[str] = []
+    line = ""
+    for word in text.split(" "):
+        candidate = f"{line} {word}" if line else word
+        if stringWidth(candidate, CELL_FONT, CELL_FONT_SIZE) <= width:
+            line = candidate
+            continue
+        if line:
+            lines.append(line)
+        line = ""
+        for ch in word:
+            if line and stringWidth(line + ch, CELL_FONT, CELL_FONT_SIZE) > width:
+                lines.append(line)
+                line = ""
+            line += ch
+    lines.append(line)
+    return "\n".join(lines)
 
+
+def _group_by_rule(findings: list[dict]) -> list[tuple[str, list[dict]]]:
+    groups: dict[str, list[dict]] = {}
+    for f in findings:
+        groups.setdefault(f.get("rule_id") or "unknown", []).append(f)
+
+    def worst(items):
+        return min(SEVERITY_ORDER.get((f.get("impact") or "moderate").lower(), 2) for f in items)
+
+    return sorted(groups.items(), key=lambda kv: (worst(kv[1]), -len(kv[1]), kv[0]))
+
+
+# Findings table columns: #, Severity, Viewport, Selector (wrapped), Element (wrapped)
+FINDINGS_COL_WIDTHS = [10 * mm, 18 * mm, 18 * mm, 58 * mm, 70 * mm]
+CELL_PADDING = 4
+
+
+def _findings_table(items: list[dict], start: int) -> LongTable:
+    rows = [["#", "Severity", "Viewport", "Selector", "Element"]]
+    viewport_w, selector_w, html_w = (w - 2 * CELL_PADDING for w in FINDINGS_COL_WIDTHS[2:])
     style = TableStyle([
         ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#0B1220")),
         ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
@@ -201,67 +264,73 @@ def build_pdf(
         ("FONTSIZE", (0, 0), (-1, 0), 9),
 
         ("GRID", (0, 0), (-1, -1), 0.3, colors.HexColor("#CBD5E1")),
-        ("FONTSIZE", (0, 1), (-1, -1), 8),
-        ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
+        ("FONTSIZE", (0, 1), (-1, -1), CELL_FONT_SIZE),
+        ("LEADING", (0, 1), (-1, -1), CELL_LEADING),
+        ("FONTNAME", (0, 1), (-1, -1), CELL_FONT),
         ("VALIGN", (0, 0), (-1, -1), "TOP"),
 
         ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#F8FAFC")]),
 
-        ("LEFTPADDING", (0, 0), (-1, -1), 4),
-        ("RIGHTPADDING", (0, 0), (-1, -1), 4),
+        ("LEFTPADDING", (0, 0), (-1, -1), CELL_PADDING),
+        ("RIGHTPADDING", (0, 0), (-1, -1), CELL_PADDING),
         ("TOPPADDING", (0, 0), (-1, -1), 3),
         ("BOTTOMPADDING", (0, 0), (-1, -1), 3),
     ])
-
-    # Color severity column
-    for r in range(1, len(rows)):
-        sev = rows[r][1]
+    for r, f in enumerate(items, start=1):
+        sev = (f.get("impact") or "moderate").lower()
+        rows.append([
+            str(start + r - 1), sev, _wrap_cell((f.get("viewport") or "").replace(",", ", "), viewport_w),
+            _wrap_cell(f.get("selector"), selector_w),
+            _wrap_cell(f.get("html"), html_w),
+        ])
+        # Color severity column
         style.add("TEXTCOLOR", (1, r), (1, r), _severity_color(sev))
         style.add("FONTNAME", (1, r), (1, r), "Helvetica-Bold")
 
-    col_widths = [
-        10 * mm,  # #
-        20 * mm,  # Severity
-        35 * mm,  # Rule
-        18 * mm,  # Viewport
-        45 * mm,  # Selector (wrapped)
-        62 * mm,  # Fix hint (wrapped)
-    ]
-
-    # Manual pagination for the table
-    remaining = rows
-    first = True
-    while remaining:
-        if not first:
-            _draw_header(c, "Findings", "continued")
-        first = False
-
-        max_height = height - 75 * mm
-        max_width = width - 36 * mm
-
-        # Find how many rows fit on this page
-        fit = min(len(remaining), 35)
-        chosen = None
-        for n in range(fit, 1, -1):
-            t = Table(remaining[:n], colWidths=col_widths, repeatRows=1)
-            t.setStyle(style)
-            tw, th = t.wrap(max_width, max_height)
-            if th <= max_height:
-                chosen = t
-                fit = n
-                break
-
-        if chosen is None:
-            # Ensure at least header + one row
-            chosen = Table(remaining[:2], colWidths=col_widths, repeatRows=1)
-            chosen.setStyle(style)
-            fit = 2
-
-        chosen.wrapOn(c, max_width, max_height)
-        chosen.drawOn(c, 18 * mm, (height - 60 * mm) - chosen._height)
-
-        remaining = remaining[fit:]
-        if remaining:
+    table = LongTable(rows, colWidths=FINDINGS_COL_WIDTHS, repeatRows=1, splitByRow=1)
+    table.setStyle(style)
+    return table
+
+
+def _findings_flowables(findings: list[dict]):
+    """Yield flowables lazily, so only one table chunk is materialised at a time."""
+    if not findings:
+        yield _para("No findings.", RULE_BODY_STYLE)
+        return
+    n = 1
+    for rule_id, items in _group_by_rule(findings):
+        first = items[0]
+        worst = min(((f.get("impact") or "moderate").lower() for f in items), key=lambda x: SEVERITY_ORDER.get(x, 2))
+        yield _para(f"{rule_id}  ·  {len(items)} finding(s)  ·  worst: {worst}", RULE_HEADING_STYLE)
+        details = [first.get("description") or ""]
+        if first.get("wcag"):
+            details.append("WCAG " + ", ".join(first["wcag"]))
+        yield _para("  ".join(d for d in details if d), RULE_BODY_STYLE)
+        if first.get("fix_hint"):
+            yield _para(f"Fix: {first['fix_hint']}", RULE_BODY_STYLE)
+        for i in range(0, len(items), FINDINGS_CHUNK_ROWS):
+            chunk = items[i:i + FINDINGS_CHUNK_ROWS]
+            yield _findings_table(chunk, n)
+            n += len(chunk)
+        yield Spacer(0, 4 * mm)
+
+
+def _flow(c: canvas.Canvas, flowables, new_frame):
+    """Place flowables top to bottom, splitting tables by row across pages."""
+    frame = new_frame("All findings, grouped by rule")
+    for fl in flowables:
+        pending = [fl]
+        while pending:
+            head = pending.pop(0)
+            if frame.add(head, c, trySplit=1):
+                continue
+            parts = frame.split(head, c)
+            if parts and frame.add(parts[0], c, trySplit=1):
+                # First part fits in what is left of this page; the rest continues on the next
+                pending[0:0] = parts[1:]
+            elif frame._atTop:
+                raise LayoutError(f"Flowable {head.__class__.__name__} does not fit on an empty page")
+            else:
+                pending.insert(0, head)
             c.showPage()
-
-    c.save()
+            frame = new_frame("continued")
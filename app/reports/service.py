@@ -0,0 +1,88 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
+from pathlib import Path
+from app.config import settings
+from app.db.repo import ScanRepo
+from app.reports.pdf import build_pdf, REPORT_TEMPLATE_VERSION
+
+# An entry lives only while some thread holds or waits on its lock
+_locks: weakref.WeakValueDictionary[str, threading.Lock] = weakref.WeakValueDictionary()
+_locks_guard = threading.Lock()
+
+
+def _fingerprint(scan: dict) -> str:
+    # Changes whenever the scan's results change (re-run, re-normalisation)
+    raw = f"{scan.get('finished_at')}|{scan.get('normalized_at')}|{json.dumps(scan.get('summary'), sort_keys=True)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def report_etag(scan: dict) -> str:
+    return f'"{scan["id"]}-v{REPORT_TEMPLATE_VERSION}-{_fingerprint(scan)}"'
+
+
+def report_path(scan: dict) -> str:
+    base = Path(settings.artifacts_dir) / "reports" / str(scan["id"])
+    return str(base / f"report-v{REPORT_TEMPLATE_VERSION}-{_fingerprint(scan)}.pdf")
+
+
+def _screenshots(scan: dict) -> dict[str, str]:
+    if scan.get("screenshots"):
+        # The PDF embeds the downscaled thumbnail, not the full-page capture
+        return {
+            name: shot if isinstance(shot, str) else shot.get("thumbnail") or shot["path"]
+            for name, shot in scan["screenshots"].items()
+        }
+    # Scans finished before screenshot paths were recorded use the fixed layout
+    base = Path(settings.artifacts_dir) / "screenshots" / str(scan["id"])
+    return {name: str(base / f"{name}.png") for name in ("desktop", "mobile")}
+
+
+def _path_lock(path: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+
+def render_report(scan_id: int) -> str | None:
+    """Return the cached PDF for a finished scan, rendering it first if needed.
+
+    Concurrent requests for the same report render it once: a thread lock covers
+    this process and an flock on a sidecar file covers other processes.
+    """
+    scan = ScanRepo.get_scan(scan_id)
+    if not scan or scan["status"] != "done":
+        return None
+    path = report_path(scan)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _path_lock(path), open(path + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if os.path.exists(path):
+                # Someone else rendered it while we waited
+                return path
+            t0 = time.perf_counter()
+            full = ScanRepo.get_scan(scan_id, include_findings=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            build_pdf(
+                out_path=tmp_path,
+                scan_id=scan_id,
+                url=full["url"],
+                robots_allowed=full["robots_allowed"] == "yes",
+                summary=full["summary"] or {},
+                findings=full["findings"],
+                screenshots=_screenshots(full),
+            )
+            os.replace(tmp_path, path)
+            ScanRepo.set_report_path(scan_id, path)
+            # Rendered on download in lazy mode, so stored directly rather than with the scan's timer
+            ScanRepo.save_timings(scan_id, {"pdf": {"seconds": round(time.perf_counter() - t0, 4), "calls": 1}})
+            return path
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
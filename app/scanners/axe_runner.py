@@ -1,16 +1,23 @@
-import asyncio
+import hashlib
+import json
+from functools import lru_cache
 from pathlib import Path
-from playwright.async_api import async_playwright
+from playwright.async_api import Page
 from app.config import settings
+from app.core.timing import stage
+from app.scanners.browser_pool import BrowserPool, browser_context
+from app.scanners.playwright_runner import open_page
+
+AXE_TAGS = ["wcag2a", "wcag2aa", "wcag21aa", "best-practice"]
 
 AXE_RUN_JS = """async () => {
   const options = {
-    runOnly: { type: 'tag', values: ['wcag2a','wcag2aa','wcag21aa','best-practice'] }
+    runOnly: { type: 'tag', values: %s }
   };
   const results = await axe.run(document, options);
   return results;
 }
-"""
+""" % json.dumps(AXE_TAGS)
 
 
 def _load_axe_source() -> str:
@@ -22,24 +29,23 @@ def _load_axe_source() -> str:
         )
     return p.read_text(encoding="utf-8")
 
-async def run_axe(url: str, viewport: dict) -> dict:
+@lru_cache(maxsize=4)
+def _axe_hash(path: str, mtime: float) -> str:
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+def axe_fingerprint() -> str:
+    """Identifies the axe build and ruleset; results are only comparable when it matches."""
+    p = Path(settings.axe_path)
+    axe_hash = _axe_hash(str(p), p.stat().st_mtime) if p.exists() else "missing"
+    return f"{axe_hash}|{','.join(AXE_TAGS)}"
+
+async def inject_and_run_axe(page: Page, axe_src: str | None = None) -> dict:
+    with stage("axe"):
+        await page.add_script_tag(content=axe_src or _load_axe_source())
+        return await page.evaluate(AXE_RUN_JS)
+
+async def run_axe(url: str, viewport: dict, pool: BrowserPool | None = None, network_stats: dict | None = None) -> dict:
     axe_src = _load_axe_source()
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            viewport={"width": viewport["width"], "height": viewport["height"]},
-            user_agent=settings.user_agent,
-        )
-        page = await context.new_page()
-        await page.goto(url, wait_until="domcontentloaded", timeout=settings.max_navigation_wait_ms)
-        try:
-            await page.wait_for_load_state("networkidle", timeout=min(settings.scan_timeout_ms, 15000))
-        except Exception:
-            pass
-
-        await page.add_script_tag(content=axe_src)
-        results = await page.evaluate(AXE_RUN_JS)
-
-        await context.close()
-        await browser.close()
-        return results
+    async with browser_context(viewport, pool, network_stats, url=url) as context:
+        page = await open_page(context, url)
+        return await inject_and_run_axe(page, axe_src)
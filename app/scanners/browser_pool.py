@@ -0,0 +1,195 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from pathlib import Path
+from playwright.async_api import async_playwright, Browser
+from app.config import settings
+from app.scanners.interception import install_interception
+from app.scanners.har import record_kwargs, install_replay
+
+
+def _process_tree_rss_mb(root_pid: int) -> float | None:
+    """Sum RSS of all descendants of root_pid (Linux only, None elsewhere)."""
+    proc = Path("/proc")
+    if not proc.exists():
+        return None
+    children: dict[int, list[int]] = {}
+    rss_pages: dict[int, int] = {}
+    for entry in proc.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+            # Field 2 (comm) may contain spaces; everything after the last ')' is fixed-width
+            fields = stat[stat.rfind(")") + 2:].split()
+            ppid = int(fields[1])
+            rss_pages[int(entry.name)] = int(fields[21])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry.name))
+
+    total = 0
+    stack = list(children.get(root_pid, []))
+    while stack:
+        pid = stack.pop()
+        total += rss_pages.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class _PooledBrowser:
+    def __init__(self, browser: Browser):
+        self.browser = browser
+        self.contexts_served = 0
+        self.active = 0
+        self.retiring = False
+        self.crashed = False
+        browser.on("disconnected", lambda _: self._on_disconnected())
+
+    def _on_disconnected(self):
+        self.crashed = True
+
+
+class BrowserPool:
+    """Long-lived Chromium instances shared by all scans of one worker process.
+
+    Every caller gets its own fresh BrowserContext (cookies, storage and cache are
+    isolated); only the browser process is shared. Browsers are recycled after
+    `max_contexts` contexts or when the browser process tree exceeds `max_memory_mb`,
+    and relaunched transparently if they crash.
+    """
+
+    def __init__(self, size: int | None = None, max_contexts: int | None = None, max_memory_mb: int | None = None):
+        self.size = max(1, size or settings.browser_pool_size)
+        self.max_contexts = max_contexts if max_contexts is not None else settings.browser_max_contexts
+        self.max_memory_mb = max_memory_mb if max_memory_mb is not None else settings.browser_max_memory_mb
+        self.launches = 0
+        self._playwright = None
+        self._browsers: list[_PooledBrowser] = []
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        async with self._lock:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            while len(self._browsers) < self.size:
+                self._browsers.append(await self._launch())
+
+    async def close(self):
+        async with self._lock:
+            for pb in self._browsers:
+                await self._close_browser(pb)
+            self._browsers = []
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+    async def _launch(self) -> _PooledBrowser:
+        browser = await self._playwright.chromium.launch(headless=True)
+        self.launches += 1
+        return _PooledBrowser(browser)
+
+    async def _close_browser(self, pb: _PooledBrowser):
+        try:
+            await pb.browser.close()
+        except Exception:
+            pass
+
+    async def _acquire(self) -> _PooledBrowser:
+        if self._playwright is None:
+            await self.start()
+        async with self._lock:
+            # Drop crashed browsers and finish retiring idle ones
+            for pb in list(self._browsers):
+                if pb.crashed or (pb.retiring and pb.active == 0):
+                    self._browsers.remove(pb)
+                    await self._close_browser(pb)
+            while len([pb for pb in self._browsers if not pb.retiring]) < self.size:
+                self._browsers.append(await self._launch())
+
+            candidates = [pb for pb in self._browsers if not pb.retiring]
+            pb = min(candidates, key=lambda b: b.active)
+            pb.active += 1
+            pb.contexts_served += 1
+            return pb
+
+    async def _release(self, pb: _PooledBrowser):
+        pb.active -= 1
+        if self.max_contexts and pb.contexts_served >= self.max_contexts:
+            pb.retiring = True
+        if self.max_memory_mb and not pb.retiring:
+            rss = await asyncio.to_thread(_process_tree_rss_mb, os.getpid())
+            if rss is not None and rss > self.max_memory_mb:
+                # The ceiling covers the whole browser tree; retire the oldest browser
+                oldest = max(self._browsers, key=lambda b: b.contexts_served)
+                oldest.retiring = True
+        if (pb.retiring or pb.crashed) and pb.active == 0:
+            async with self._lock:
+                if pb in self._browsers:
+                    self._browsers.remove(pb)
+                    await self._close_browser(pb)
+
+    @asynccontextmanager
+    async def context(self, **context_kwargs):
+        """Yield a fresh BrowserContext on a pooled browser; relaunches once on crash."""
+        pb = await self._acquire()
+        try:
+            try:
+                ctx = await pb.browser.new_context(**context_kwargs)
+            except Exception:
+                if pb.browser.is_connected():
+                    raise
+                pb.crashed = True
+                await self._release(pb)
+                pb = await self._acquire()
+                ctx = await pb.browser.new_context(**context_kwargs)
+            try:
+                yield ctx
+            finally:
+                try:
+                    await ctx.close()
+                except Exception:
+                    pass
+        finally:
+            await self._release(pb)
+
+
+async def _prepare_context(ctx, url: str | None, viewport: dict, network_stats: dict | None):
+    # A replayed context is served entirely from the HAR; blocking and caching don't apply
+    if not await install_replay(ctx, url, viewport):
+        await install_interception(ctx, network_stats)
+
+
+@asynccontextmanager
+async def browser_context(
+    viewport: dict, pool: BrowserPool | None = None, network_stats: dict | None = None, url: str | None = None,
+):
+    """Yield an isolated BrowserContext for one viewport.
+
+    Uses the pool when given; otherwise launches a throwaway browser (CLI/one-off use).
+    Request blocking and the HTTP cache are installed per context; their counts are
+    added to `network_stats`. With HAR_MODE set, `url` selects the HAR the context
+    records to or replays from.
+    """
+    context_kwargs = {
+        "viewport": {"width": viewport["width"], "height": viewport["height"]},
+        "user_agent": settings.user_agent,
+        **record_kwargs(url, viewport),
+    }
+    if pool is not None:
+        async with pool.context(**context_kwargs) as ctx:
+            await _prepare_context(ctx, url, viewport, network_stats)
+            yield ctx
+        return
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            ctx = await browser.new_context(**context_kwargs)
+            try:
+                await _prepare_context(ctx, url, viewport, network_stats)
+                yield ctx
+            finally:
+                await ctx.close()
+        finally:
+            await browser.close()
@@ -0,0 +1,38 @@
+import hashlib
+from pathlib import Path
+from urllib.parse import urlsplit
+from playwright.async_api import BrowserContext
+from app.config import settings
+from app.core.urls import canonicalize_url
+
+
+def har_path(url: str, viewport: dict) -> Path:
+    """One HAR per page and viewport: <HAR_DIR>/<host>/<url hash>-<viewport>.zip"""
+    canonical = canonicalize_url(url)
+    host = (urlsplit(canonical).hostname or "_").lower()
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+    return Path(settings.har_dir) / host / f"{digest}-{viewport['name']}.zip"
+
+
+def record_kwargs(url: str | None, viewport: dict) -> dict:
+    """new_context() arguments that record the page's traffic (HAR_MODE=record)."""
+    if settings.har_mode != "record" or url is None:
+        return {}
+    path = har_path(url, viewport)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A .zip HAR keeps response bodies as attachments; written when the context closes
+    return {"record_har_path": str(path), "record_har_mode": "full"}
+
+
+async def install_replay(context: BrowserContext, url: str | None, viewport: dict) -> bool:
+    """Serve every request of the context from the recorded HAR (HAR_MODE=replay).
+
+    Requests missing from the HAR are aborted, so a replayed scan never touches the network.
+    """
+    if settings.har_mode != "replay" or url is None:
+        return False
+    path = har_path(url, viewport)
+    if not path.exists():
+        raise FileNotFoundError(f"No HAR recorded for {url} ({viewport['name']}): {path}")
+    await context.route_from_har(path, not_found="abort")
+    return True
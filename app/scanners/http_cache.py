@@ -0,0 +1,66 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+from app.config import settings
+
+# Only these are cached; documents and XHR are always fetched live
+STATIC_RESOURCE_TYPES = {"stylesheet", "script", "image", "font"}
+MAX_ENTRY_BYTES = 5 * 1024 * 1024
+# Not replayed: the body is stored decoded, and cookies must not leak between scans
+DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "set-cookie"}
+
+
+def cache_root() -> Path:
+    return Path(settings.artifacts_dir) / "http_cache"
+
+
+def _entry_path(url: str) -> Path:
+    host = (urlsplit(url).hostname or "_").lower()
+    return cache_root() / host / hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def get(url: str) -> dict | None:
+    """Cached {"status", "headers", "body"} for a static asset, if still fresh."""
+    path = _entry_path(url)
+    try:
+        if time.time() - os.path.getmtime(path) > settings.http_cache_ttl_seconds:
+            return None
+        with open(path, "rb") as f:
+            meta = json.loads(f.readline())
+            body = f.read()
+    except (FileNotFoundError, ValueError):
+        return None
+    # Entries written before cacheable() was tightened
+    if not cacheable(meta["status"], meta["headers"], body):
+        return None
+    return {"status": meta["status"], "headers": meta["headers"], "body": body}
+
+
+def cacheable(status: int, headers: dict[str, str], body: bytes) -> bool:
+    """Entries are keyed by URL alone, so responses that differ per requester are not cached.
+
+    That covers Vary (except Accept-Encoding: bodies are stored decoded) and a
+    CORS allow-origin echoing one site, which would block the asset on another.
+    """
+    cache_control = headers.get("cache-control", "").lower()
+    if status != 200 or "no-store" in cache_control or "private" in cache_control or len(body) > MAX_ENTRY_BYTES:
+        return False
+    vary = {v.strip().lower() for v in headers.get("vary", "").split(",") if v.strip()}
+    if vary - {"accept-encoding"}:
+        return False
+    return headers.get("access-control-allow-origin", "*").strip() == "*"
+
+
+def put(url: str, status: int, headers: dict[str, str], body: bytes):
+    path = _entry_path(url)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    meta = {"url": url, "status": status, "headers": {k: v for k, v in headers.items() if k.lower() not in DROP_HEADERS}}
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(json.dumps(meta).encode("utf-8") + b"\n")
+        f.write(body)
+    os.replace(tmp_path, path)
@@ -0,0 +1,93 @@
+import asyncio
+from fnmatch import fnmatchcase
+from urllib.parse import urlsplit
+from playwright.async_api import BrowserContext, Route, Request
+from app.config import settings
+from app.domain.blocklists import BLOCK_PROFILES, is_tracker
+from app.scanners import http_cache
+
+
+def new_network_stats() -> dict:
+    return {"blocked": {}, "cache_hits": 0, "cache_misses": 0, "cache_bytes": 0}
+
+
+def network_summary(stats: dict) -> dict:
+    """Per-scan record: blocked requests by reason and bytes served from the HTTP cache."""
+    return {
+        "profile": settings.scan_block_profile,
+        "blocked_total": sum(stats["blocked"].values()),
+        **stats,
+    }
+
+
+def interception_fingerprint() -> str:
+    """What the interception settings change about a page; part of the result cache key."""
+    return f"{settings.scan_block_profile}|{settings.scan_block_globs}"
+
+
+class _Rules:
+    def __init__(self):
+        self.resource_types, self.trackers = BLOCK_PROFILES.get(settings.scan_block_profile, BLOCK_PROFILES["none"])
+        self.globs = [g.strip() for g in settings.scan_block_globs.split(",") if g.strip()]
+        self.cache = settings.http_cache
+
+    @property
+    def active(self) -> bool:
+        return bool(self.resource_types or self.trackers or self.globs or self.cache)
+
+    def block_reason(self, request: Request) -> str | None:
+        try:
+            if request.is_navigation_request() and request.frame.parent_frame is None:
+                # Never block the page under test itself
+                return None
+        except Exception:
+            pass
+        if request.resource_type in self.resource_types:
+            return request.resource_type
+        url = request.url
+        if self.trackers and is_tracker(urlsplit(url).hostname or ""):
+            return "tracker"
+        if any(fnmatchcase(url, g) for g in self.globs):
+            return "custom"
+        return None
+
+
+async def install_interception(context: BrowserContext, stats: dict | None = None):
+    """Route the context's requests through SCAN_BLOCK_PROFILE / SCAN_BLOCK_GLOBS and the HTTP cache.
+
+    Does nothing (no routing overhead) when neither is configured. Counts go into
+    `stats` (see new_network_stats).
+    """
+    rules = _Rules()
+    if not rules.active:
+        return
+    stats = stats if stats is not None else new_network_stats()
+
+    async def handle(route: Route, request: Request):
+        reason = rules.block_reason(request)
+        if reason:
+            stats["blocked"][reason] = stats["blocked"].get(reason, 0) + 1
+            await route.abort("blockedbyclient")
+            return
+        if not (rules.cache and request.method == "GET" and request.resource_type in http_cache.STATIC_RESOURCE_TYPES):
+            await route.continue_()
+            return
+
+        hit = await asyncio.to_thread(http_cache.get, request.url)
+        if hit:
+            stats["cache_hits"] += 1
+            stats["cache_bytes"] += len(hit["body"])
+            await route.fulfill(status=hit["status"], headers=hit["headers"], body=hit["body"])
+            return
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception:
+            await route.continue_()
+            return
+        stats["cache_misses"] += 1
+        if http_cache.cacheable(response.status, response.headers, body):
+            await asyncio.to_thread(http_cache.put, request.url, response.status, response.headers, body)
+        await route.fulfill(response=response, body=body)
+
+    await context.route("**/*", handle)
@@ -0,0 +1,60 @@
+import hashlib
+from typing import Awaitable, Callable
+from app.scanners.browser_pool import BrowserPool, browser_context
+from app.scanners.playwright_runner import open_page, capture_screenshot
+from app.scanners.axe_runner import inject_and_run_axe
+from app.core.timing import stage
+
+COLLECT_LINKS_JS = "els => els.map(e => e.href).filter(h => h && h.startsWith('http'))"
+
+# Rendered DOM without what changes on every load but not for axe:
+# scripts, comments, nonces/integrity hashes and whitespace
+NORMALIZED_DOM_JS = """() => {
+  const root = document.documentElement.cloneNode(true);
+  root.querySelectorAll('script, noscript').forEach(e => e.remove());
+  const walker = document.createTreeWalker(root, NodeFilter.SHOW_COMMENT);
+  const comments = [];
+  while (walker.nextNode()) comments.push(walker.currentNode);
+  comments.forEach(c => c.remove());
+  root.querySelectorAll('[nonce], [integrity]').forEach(e => {
+    e.removeAttribute('nonce');
+    e.removeAttribute('integrity');
+  });
+  return root.outerHTML.replace(/\\s+/g, ' ');
+}
+"""
+
+async def scan_page(
+    url: str,
+    viewport: dict,
+    screenshot: bool = True,
+    pool: BrowserPool | None = None,
+    collect_links: bool = False,
+    reuse: Callable[[str], Awaitable[bool]] | None = None,
+    network_stats: dict | None = None,
+) -> dict:
+    """Navigate once, take the full-page screenshot, then run axe on the same page.
+
+    The screenshot is taken before axe is injected so it shows the page as loaded.
+    Pass screenshot=False to skip it; collect_links also returns the page's
+    absolute <a href> targets (used by crawl scans).
+
+    With `reuse`, the normalized DOM is hashed after load and passed to it; if it
+    returns True (a cached result exists) the screenshot and axe are skipped and
+    the result has axe=None.
+
+    Blocked requests and HTTP cache use are counted into `network_stats`.
+    """
+    async with browser_context(viewport, pool, network_stats, url=url) as context:
+        page = await open_page(context, url)
+        dom_hash = None
+        if reuse is not None:
+            with stage("dom_hash"):
+                dom = await page.evaluate(NORMALIZED_DOM_JS)
+                dom_hash = hashlib.sha256(dom.encode("utf-8")).hexdigest()
+            if await reuse(dom_hash):
+                return {"axe": None, "links": [], "final_url": page.url, "screenshot": None, "dom_hash": dom_hash}
+        shot = await capture_screenshot(page) if screenshot else None
+        links = await page.eval_on_selector_all("a[href]", COLLECT_LINKS_JS) if collect_links else []
+        results = await inject_and_run_axe(page)
+        return {"axe": results, "links": links, "final_url": page.url, "screenshot": shot, "dom_hash": dom_hash}
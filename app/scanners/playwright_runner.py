@@ -1,30 +1,48 @@
 import asyncio
-from pathlib import Path
-from playwright.async_api import async_playwright
+from playwright.async_api import BrowserContext, Page
 from app.config import settings
+from app.core.images import process_screenshot
+from app.core.timing import stage
+from app.core.politeness import wait_for_host
+from app.scanners.browser_pool import BrowserPool, browser_context
+from app.scanners.settle import PageSettler
 
-async def open_and_capture(url: str, viewport: dict, screenshot_path: str) -> dict:
-    """Open URL with given viewport and return minimal page info."""
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            viewport={"width": viewport["width"], "height": viewport["height"]},
-            user_agent=settings.user_agent,
-        )
-        page = await context.new_page()
+async def open_page(context: BrowserContext, url: str) -> Page:
+    """Navigate a new page to url and wait until it has settled."""
+    # Shared per-host rate limit (HOST_RATE_PER_MINUTE, robots.txt Crawl-delay)
+    with stage("politeness"):
+        await wait_for_host(url)
+    page = await context.new_page()
+    settler = PageSettler(page, url)
+    await settler.prepare()
+    with stage("navigation"):
         await page.goto(url, wait_until="domcontentloaded", timeout=settings.max_navigation_wait_ms)
-        # Give SPAs a moment to settle; keep it short for single page MVP
-        try:
-            await page.wait_for_load_state("networkidle", timeout=min(settings.scan_timeout_ms, 15000))
-        except Exception:
-            pass
+    # Wait for SPAs to render and late requests to finish (SETTLE_STRATEGY)
+    with stage("settle"):
+        await settler.wait()
+    return page
+
+PAGE_HEIGHT_JS = "() => Math.max(document.documentElement.scrollHeight, document.body ? document.body.scrollHeight : 0)"
 
-        Path(screenshot_path).parent.mkdir(parents=True, exist_ok=True)
-        await page.screenshot(path=screenshot_path, full_page=True)
+async def capture_screenshot(page: Page) -> dict:
+    """Full-page screenshot, capped at SCREENSHOT_MAX_HEIGHT, compressed off the event loop."""
+    kwargs = {"full_page": True}
+    max_h = settings.screenshot_max_height
+    with stage("screenshot"):
+        if max_h:
+            height = await page.evaluate(PAGE_HEIGHT_JS)
+            if height > max_h:
+                kwargs["clip"] = {"x": 0, "y": 0, "width": page.viewport_size["width"], "height": max_h}
+        png = await page.screenshot(**kwargs)
+    with stage("image_processing"):
+        shot = await asyncio.to_thread(process_screenshot, png)
+    shot["truncated"] = "clip" in kwargs
+    return shot
 
-        # Return objects needed for axe run (we'll re-use the same page if desired)
-        # For simplicity, axe is run in a separate helper (caller can keep same page)
+async def open_and_capture(url: str, viewport: dict, pool: BrowserPool | None = None, network_stats: dict | None = None) -> dict:
+    """Open URL with given viewport and return minimal page info."""
+    async with browser_context(viewport, pool, network_stats, url=url) as context:
+        page = await open_page(context, url)
+        shot = await capture_screenshot(page)
         html = await page.content()
-        await context.close()
-        await browser.close()
-        return {"html": html}
+        return {"html": html, "screenshot": shot}
@@ -0,0 +1,122 @@
+import asyncio
+from urllib.parse import urlsplit
+from playwright.async_api import Page, Request
+from app.config import settings
+from app.core.urls import host_of
+from app.db.repo import SettleStatsRepo
+from app.domain.blocklists import is_tracker
+
+# Records when the DOM last changed; installed before any page script runs
+MUTATION_TRACKER_JS = """(() => {
+  window.__bfsgLastMutation = performance.now();
+  new MutationObserver(() => { window.__bfsgLastMutation = performance.now(); })
+    .observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+})();"""
+SINCE_MUTATION_JS = "() => performance.now() - (window.__bfsgLastMutation ?? 0)"
+
+# Never finish, or don't change what axe sees ("ping" includes sendBeacon)
+IGNORED_RESOURCE_TYPES = {"websocket", "eventsource", "ping", "media"}
+# A request open this long is long-polling or streaming; stop waiting for it
+LONG_REQUEST_MS = 5000
+POLL_MS = 100
+# Weight of the newest sample in the per-host moving average
+EWMA_ALPHA = 0.3
+# Learned ceiling = average settle time * headroom + quiet window
+HEADROOM = 2.0
+MIN_SAMPLES = 3
+
+
+def _ignored(request: Request) -> bool:
+    if request.resource_type in IGNORED_RESOURCE_TYPES:
+        return True
+    return is_tracker(urlsplit(request.url).hostname or "")
+
+
+def ceiling_ms(stats: dict | None) -> float:
+    """Longest wait for a host: learned from earlier scans, within SETTLE_MIN_MS..SETTLE_MAX_MS."""
+    limit = min(settings.scan_timeout_ms, settings.settle_max_ms)
+    if not stats or stats["samples"] < MIN_SAMPLES:
+        return limit
+    learned = stats["ewma_ms"] * HEADROOM + settings.settle_quiet_ms
+    return max(settings.settle_min_ms, min(limit, learned))
+
+
+class PageSettler:
+    """Waits until a page has settled: no DOM mutations and no relevant requests for SETTLE_QUIET_MS.
+
+    Requests to tracker/beacon hosts, websockets, media and long-polls are not waited
+    for. The wait is capped by a ceiling learned per host, never above SETTLE_MAX_MS.
+    Call prepare() before navigating and wait() after DOMContentLoaded.
+    """
+
+    def __init__(self, page: Page, url: str):
+        self.page = page
+        self.host = host_of(url)
+        self.pending: dict[Request, float] = {}
+        self.last_activity = 0.0
+        self._loop = asyncio.get_running_loop()
+
+    async def prepare(self):
+        if settings.settle_strategy != "adaptive":
+            return
+        await self.page.add_init_script(MUTATION_TRACKER_JS)
+        self.page.on("request", self._on_request)
+        self.page.on("requestfinished", self._on_done)
+        self.page.on("requestfailed", self._on_done)
+
+    def _on_request(self, request: Request):
+        # Beacons firing every few hundred ms must not keep the page "busy"
+        if not _ignored(request):
+            self.last_activity = self._loop.time()
+            self.pending[request] = self.last_activity
+
+    def _on_done(self, request: Request):
+        if self.pending.pop(request, None) is not None:
+            self.last_activity = self._loop.time()
+
+    def _busy(self, now: float) -> bool:
+        return any((now - started) * 1000 < LONG_REQUEST_MS for started in self.pending.values())
+
+    async def _since_mutation_ms(self) -> float:
+        try:
+            return await self.page.evaluate(SINCE_MUTATION_JS)
+        except Exception:
+            # Mid-navigation (client-side redirect): the page is not quiet
+            return 0.0
+
+    async def wait(self) -> dict:
+        if settings.settle_strategy != "adaptive":
+            try:
+                await self.page.wait_for_load_state("networkidle", timeout=min(settings.scan_timeout_ms, settings.settle_max_ms))
+            except Exception:
+                pass
+            return {"strategy": settings.settle_strategy}
+
+        stats = await asyncio.to_thread(SettleStatsRepo.get, self.host) if self.host else None
+        limit = ceiling_ms(stats)
+        quiet = settings.settle_quiet_ms
+        start = self._loop.time()
+        timed_out = False
+        try:
+            while True:
+                now = self._loop.time()
+                elapsed = (now - start) * 1000
+                if elapsed >= limit:
+                    timed_out = True
+                    settled = elapsed
+                    break
+                if not self._busy(now) and (now - self.last_activity) * 1000 >= quiet:
+                    since_mutation = await self._since_mutation_ms()
+                    if since_mutation >= quiet:
+                        # The page went quiet when the last mutation or request happened
+                        settled = max(0.0, elapsed - min(since_mutation, (now - self.last_activity) * 1000, elapsed))
+                        break
+                await asyncio.sleep(POLL_MS / 1000)
+        finally:
+            self.page.remove_listener("request", self._on_request)
+            self.page.remove_listener("requestfinished", self._on_done)
+            self.page.remove_listener("requestfailed", self._on_done)
+
+        if self.host:
+            await asyncio.to_thread(SettleStatsRepo.record, self.host, settled, timed_out, EWMA_ALPHA)
+        return {"strategy": "adaptive", "settle_ms": round(settled), "ceiling_ms": round(limit), "timed_out": timed_out}
@@ -16,7 +16,7 @@ def ui_home(request: Request):
 
 @router.post("/ui/scan")
 def ui_create_scan(url: str = Form(...)):
-    scan_id = enqueue_scan(url)
+    scan_id, _ = enqueue_scan(url)
     return RedirectResponse(url=f"/ui/scan/{scan_id}", status_code=303)
 
 
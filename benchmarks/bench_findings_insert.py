@@ -0,0 +1,80 @@
+"""Insert rate of ScanRepo.replace_findings for a large scan.
+
+Compares the previous per-object ORM inserts (delete committed separately) with
+the current single-transaction executemany path, on a throwaway SQLite file.
+
+    python -m benchmarks.bench_findings_insert --findings 10000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+
+def _sample_findings(n: int) -> list[dict]:
+    return [
+        {
+            "viewport": "desktop" if i % 2 else "mobile",
+            "rule_id": f"rule-{i % 40}",
+            "impact": ("critical", "serious", "moderate", "minor")[i % 4],
+            "wcag": ["1.4.3"],
+            "description": "Elements must meet minimum color contrast ratio thresholds",
+            "help_url": "https://dequeuniversity.com/rules/axe/4.10/color-contrast",
+            "selector": f"main > div:nth-child({i}) > a",
+            "html": f'<a href="/item/{i}" class="link link--muted">Item {i}</a>',
+            "screenshot_path": "data/artifacts/screenshots/1/desktop.png",
+            "fix_hint": "Increase text/background contrast.",
+            "code_snippet": ".button{ color:#111; background:#fff; }",
+        }
+        for i in range(n)
+    ]
+
+
+def _legacy_replace_findings(scan_id: int, findings: list[dict]):
+    from app.db.session import get_session
+    from app.db.models import Finding, Scan
+    from app.db.repo import ScanRepo
+
+    with get_session() as db:
+        if not db.get(Scan, scan_id):
+            return
+        db.query(Finding).filter(Finding.scan_id == scan_id).delete()
+        db.commit()
+        for f in findings:
+            db.add(Finding(**ScanRepo._finding_values(scan_id, f)))
+        db.commit()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--findings", type=int, default=10000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bfsg-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.sqlite"
+
+    from app.db.session import init_db
+    from app.db.repo import ScanRepo
+
+    init_db()
+    scan_id = ScanRepo.create_scan("https://example.com")
+    findings = _sample_findings(args.findings)
+
+    results = {}
+    for name, fn in (("legacy_orm", _legacy_replace_findings), ("bulk", ScanRepo.replace_findings)):
+        timings = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            fn(scan_id, findings)
+            timings.append(time.perf_counter() - t0)
+        best = min(timings)
+        results[name] = {"best_seconds": round(best, 4), "rows_per_second": round(args.findings / best)}
+
+    results["speedup"] = round(results["legacy_orm"]["best_seconds"] / results["bulk"]["best_seconds"], 2)
+    print(json.dumps({"findings": args.findings, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""PDF findings layout: current one-pass engine vs the previous trial-and-error paginator.
+
+The previous paginator is reproduced here (without its 50-finding cap) because it
+no longer exists in app/reports/pdf.py.
+
+    python -m benchmarks.bench_pdf --sizes 100,1000,10000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import multiprocessing
+import resource
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Paragraph, Table, TableStyle
+
+from app.reports.pdf import build_pdf, FIX_HINT_STYLE, SELECTOR_STYLE, _draw_header, _severity_color
+from benchmarks.bench_findings_insert import _sample_findings
+
+
+def _legacy_build(out_path: str, findings: list[dict]):
+    c = canvas.Canvas(out_path, pagesize=A4)
+    width, height = A4
+    _draw_header(c, "Findings", "legacy")
+
+    rows = [["#", "Severity", "Rule", "Viewport", "Selector", "Fix hint"]]
+    for i, f in enumerate(findings, start=1):
+        sev = (f.get("impact") or "moderate").lower()
+        rows.append([
+            str(i), sev, f.get("rule_id") or "", f.get("viewport") or "",
+            Paragraph(f.get("selector") or "&nbsp;", SELECTOR_STYLE),
+            Paragraph(f.get("fix_hint") or "&nbsp;", FIX_HINT_STYLE),
+        ])
+    style = TableStyle([
+        ("GRID", (0, 0), (-1, -1), 0.3, colors.HexColor("#CBD5E1")),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ])
+    for r in range(1, len(rows)):
+        style.add("TEXTCOLOR", (1, r), (1, r), _severity_color(rows[r][1]))
+        style.add("FONTNAME", (1, r), (1, r), "Helvetica-Bold")
+    col_widths = [10 * mm, 20 * mm, 35 * mm, 18 * mm, 45 * mm, 62 * mm]
+
+    remaining = rows
+    first = True
+    while remaining:
+        if not first:
+            _draw_header(c, "Findings", "continued")
+        first = False
+        max_height = height - 75 * mm
+        max_width = width - 36 * mm
+        fit = min(len(remaining), 35)
+        chosen = None
+        for n in range(fit, 1, -1):
+            t = Table(remaining[:n], colWidths=col_widths, repeatRows=1)
+            t.setStyle(style)
+            tw, th = t.wrap(max_width, max_height)
+            if th <= max_height:
+                chosen = t
+                fit = n
+                break
+        if chosen is None:
+            chosen = Table(remaining[:2], colWidths=col_widths, repeatRows=1)
+            chosen.setStyle(style)
+            fit = 2
+        chosen.wrapOn(c, max_width, max_height)
+        chosen.drawOn(c, 18 * mm, (height - 60 * mm) - chosen._height)
+        remaining = remaining[fit:]
+        if remaining:
+            c.showPage()
+    c.save()
+
+
+def _current_build(out_path: str, findings: list[dict]):
+    build_pdf(out_path=out_path, scan_id=1, url="https://example.com", robots_allowed=True,
+              summary={"total": len(findings)}, findings=findings, screenshots={})
+
+
+def _run_in_child(name: str, out_path: str, n: int) -> dict:
+    fn = {"current": _current_build, "legacy": _legacy_build}[name]
+    findings = _sample_findings(n)
+    t0 = time.perf_counter()
+    fn(out_path, findings)
+    elapsed = time.perf_counter() - t0
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"seconds": round(elapsed, 3), "ms_per_finding": round(elapsed * 1000 / max(n, 1), 3),
+            "peak_rss_mb": round(peak_kb / 1024, 1), "bytes": os.path.getsize(out_path)}
+
+
+def _measure(name: str, out_path: str, n: int) -> dict:
+    # Fresh process per run so peak RSS belongs to that run alone
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(_run_in_child, (name, out_path, n))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="100,1000,10000")
+    ap.add_argument("--legacy-max", type=int, default=0, help="skip the legacy engine above this many findings (0 = never)")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bfsg-bench-pdf-")
+    results = []
+    for n in (int(x) for x in args.sizes.split(",")):
+        row = {"findings": n, "current": _measure("current", f"{tmp}/current_{n}.pdf", n)}
+        if not args.legacy_max or n <= args.legacy_max:
+            row["legacy"] = _measure("legacy", f"{tmp}/legacy_{n}.pdf", n)
+        results.append(row)
+        print(json.dumps(row), flush=True)
+    print(json.dumps({"results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""End-to-end scan pipeline against the local fixture site (see benchmarks/fixture_site.py).
+
+Per page type, times each stage of a page scan separately: robots, navigation,
+screenshot, axe, normalize_axe_results, replace_findings and build_pdf (summed
+over both viewports). Then measures whole-scan throughput of run_scan_job_async
+with 1..N scans running concurrently on one browser pool.
+
+Needs Chromium (`python -m playwright install chromium`) and AXE_PATH. Uses a
+throwaway database and artifacts directory.
+
+    python -m benchmarks.bench_pipeline --pages small,violations --repeat 3 \\
+        --concurrency 1,2,4 --scans 8 --out bench-pipeline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from benchmarks.fixture_site import FixtureSite, PAGES
+
+STAGES = ("robots", "navigation", "screenshot", "axe", "normalize", "replace_findings", "build_pdf")
+
+
+@contextmanager
+def _timed(timings: dict, stage: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - t0
+
+
+async def _staged_scan(url: str, pool, scan_id: int, out_dir: str) -> dict:
+    """One page scan, stage by stage, with the same calls run_scan_job_async makes."""
+    from app.core.robots import is_allowed
+    from app.core.normalize import normalize_axe_results, merge_viewports, summarize_findings
+    from app.db.repo import ScanRepo
+    from app.domain.viewports import get_viewports
+    from app.reports.pdf import build_pdf
+    from app.reports.service import _screenshots
+    from app.scanners.axe_runner import inject_and_run_axe
+    from app.scanners.browser_pool import browser_context
+    from app.scanners.playwright_runner import open_page, capture_screenshot
+
+    timings: dict[str, float] = {}
+    with _timed(timings, "robots"):
+        await asyncio.to_thread(is_allowed, url)
+
+    findings: list[dict] = []
+    shots: dict[str, dict] = {}
+    for vp in get_viewports():
+        async with browser_context(vp, pool, url=url) as context:
+            with _timed(timings, "navigation"):
+                page = await open_page(context, url)
+            with _timed(timings, "screenshot"):
+                shots[vp["name"]] = await capture_screenshot(page)
+            with _timed(timings, "axe"):
+                raw = await inject_and_run_axe(page)
+        with _timed(timings, "normalize"):
+            findings.extend(normalize_axe_results(raw, viewport_name=vp["name"], screenshot_path=shots[vp["name"]]["path"]))
+    with _timed(timings, "normalize"):
+        findings = merge_viewports(findings)
+        summary = summarize_findings(findings)
+
+    with _timed(timings, "replace_findings"):
+        await asyncio.to_thread(ScanRepo.replace_findings, scan_id, findings)
+    with _timed(timings, "build_pdf"):
+        await asyncio.to_thread(
+            build_pdf, out_path=os.path.join(out_dir, f"{scan_id}.pdf"), scan_id=scan_id, url=url,
+            robots_allowed=True, summary=summary, findings=findings, screenshots=_screenshots({"screenshots": shots}),
+        )
+    timings["total"] = sum(timings.values())
+    return {"timings": timings, "findings": len(findings)}
+
+
+def _stats(values: list[float]) -> dict:
+    return {
+        "min": round(min(values), 4),
+        "median": round(statistics.median(values), 4),
+        "max": round(max(values), 4),
+    }
+
+
+def _percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(p * (len(ordered) - 1)))]
+
+
+async def _stages(site: FixtureSite, pages: list[str], repeat: int, pool, out_dir: str) -> dict:
+    from app.db.repo import ScanRepo
+
+    results = {}
+    for name in pages:
+        url = site.url(name)
+        runs = []
+        for _ in range(repeat):
+            scan_id = await asyncio.to_thread(ScanRepo.create_scan, url)
+            runs.append(await _staged_scan(url, pool, scan_id, out_dir))
+        results[name] = {
+            "findings": runs[-1]["findings"],
+            "stages": {stage: _stats([r["timings"].get(stage, 0.0) for r in runs]) for stage in STAGES + ("total",)},
+        }
+    return results
+
+
+async def _throughput(site: FixtureSite, page: str, levels: list[int], scans: int, pool) -> list[dict]:
+    from app.core.scan_service import run_scan_job_async
+    from app.db.repo import ScanRepo
+
+    url = site.url(page)
+    results = []
+    for concurrency in levels:
+        scan_ids = [await asyncio.to_thread(ScanRepo.create_scan, url, force_refresh=True) for _ in range(scans)]
+        limit = asyncio.Semaphore(concurrency)
+        latencies: list[float] = []
+        failures = 0
+
+        async def one(scan_id: int):
+            nonlocal failures
+            async with limit:
+                t0 = time.perf_counter()
+                try:
+                    await run_scan_job_async(scan_id, pool)
+                except Exception:
+                    failures += 1
+                latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(scan_id) for scan_id in scan_ids))
+        wall = time.perf_counter() - t0
+        results.append({
+            "concurrency": concurrency,
+            "scans": scans,
+            "failures": failures,
+            "wall_seconds": round(wall, 3),
+            "scans_per_minute": round(60 * scans / wall, 2),
+            "latency_p50": round(_percentile(latencies, 0.5), 3),
+            "latency_p95": round(_percentile(latencies, 0.95), 3),
+        })
+    return results
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def _run(args, site: FixtureSite, out_dir: str) -> dict:
+    from app.scanners.browser_pool import BrowserPool
+
+    pool = BrowserPool(size=args.pool_size, max_contexts=0, max_memory_mb=0)
+    try:
+        await pool.start()
+        stages = await _stages(site, args.pages, args.repeat, pool, out_dir) if args.repeat else {}
+        throughput = await _throughput(site, args.throughput_page, args.concurrency, args.scans, pool) if args.scans else []
+    finally:
+        await pool.close()
+    return {"stages": stages, "throughput": throughput}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=lambda s: s.split(","), default=list(PAGES), help=f"comma-separated, from {','.join(PAGES)}")
+    ap.add_argument("--repeat", type=int, default=3, help="staged runs per page (0 = skip)")
+    ap.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",")], default=[1, 2, 4])
+    ap.add_argument("--scans", type=int, default=8, help="scans per concurrency level (0 = skip)")
+    ap.add_argument("--throughput-page", default="small")
+    ap.add_argument("--pool-size", type=int, default=1)
+    ap.add_argument("--out", default=None, help="write the JSON result here as well as to stdout")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bfsg-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.sqlite"
+    os.environ["ARTIFACTS_DIR"] = os.path.join(tmp, "artifacts")
+    # Every scan does the full work, including its PDF
+    os.environ["RESULT_CACHE"] = "false"
+    os.environ["REPORT_MODE"] = "inline"
+    # Every fixture page is on 127.0.0.1: per-host politeness would only add sleeps
+    os.environ["HOST_RATE_PER_MINUTE"] = "0"
+    os.environ["HOST_MAX_CONCURRENCY"] = "0"
+    os.environ["RESPECT_CRAWL_DELAY"] = "false"
+
+    from app.db.session import init_db
+
+    init_db()
+    started_at = datetime.utcnow().isoformat() + "Z"
+    with FixtureSite() as site:
+        results = asyncio.run(_run(args, site, tmp))
+
+    report = {
+        "benchmark": "pipeline",
+        "started_at": started_at,
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "params": {k: v for k, v in vars(args).items() if k != "out"},
+        **results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Local HTTP server with synthetic pages for the pipeline benchmarks.
+
+    python -m benchmarks.fixture_site --port 8765     # serve until Ctrl-C
+
+Pages (all deterministic, no external requests):
+    /small        a short, mostly clean article
+    /huge-dom     ~N nested elements (?nodes=20000)
+    /violations   many axe violations: missing alt, labels, contrast, empty links/buttons
+    /slow         a page whose CSS, script and images answer after ?delay=2 seconds
+    /long         a very tall page (?height=30000 px) for full-page screenshots
+"""
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+PAGES = ("small", "huge-dom", "violations", "slow", "long")
+
+# 1x1 grey GIF
+PIXEL_GIF = bytes.fromhex("47494638396101000100800000c0c0c000000021f90401000000002c00000000010001000002024401003b")
+
+
+def _doc(title: str, body: str, head: str = "") -> str:
+    return (
+        f'<!doctype html><html lang="en"><head><meta charset="utf-8"><title>{title}</title>{head}</head>'
+        f"<body>{body}</body></html>"
+    )
+
+
+def _small(_: dict) -> str:
+    paragraphs = "".join(f"<p>Paragraph {i} of a short article with a <a href='/small#p{i}'>link</a>.</p>" for i in range(12))
+    return _doc("Small page", f"<header><nav><a href='/small'>Home</a></nav></header><main><h1>Small page</h1>{paragraphs}</main>")
+
+
+def _huge_dom(q: dict) -> str:
+    nodes = int(q.get("nodes", ["20000"])[0])
+    rows = "".join(
+        f"<li class='item'><div><span>Item {i}</span> <a href='/small?i={i}'>open</a></div></li>"
+        for i in range(nodes // 4)
+    )
+    return _doc("Huge DOM", f"<main><h1>Huge DOM</h1><ul>{rows}</ul></main>")
+
+
+def _violations(q: dict) -> str:
+    n = int(q.get("n", ["300"])[0])
+    parts = []
+    for i in range(n):
+        kind = i % 5
+        if kind == 0:
+            parts.append(f"<img src='/asset/pixel.gif?i={i}'>")
+        elif kind == 1:
+            parts.append(f"<input type='text' name='field{i}'>")
+        elif kind == 2:
+            parts.append(f"<p style='color:#bbb;background:#fff'>Low contrast text {i}</p>")
+        elif kind == 3:
+            parts.append(f"<a href='/small?v={i}'></a>")
+        else:
+            parts.append("<button></button>")
+    # No lang attribute and no <main>/<h1>: page-level violations too
+    return f"<!doctype html><html><head><title>Violations</title></head><body>{''.join(parts)}</body></html>"
+
+
+def _slow(q: dict) -> str:
+    delay = q.get("delay", ["2"])[0]
+    head = f"<link rel='stylesheet' href='/asset/style.css?delay={delay}'><script src='/asset/app.js?delay={delay}'></script>"
+    images = "".join(f"<img alt='Image {i}' src='/asset/pixel.gif?delay={delay}&i={i}'>" for i in range(6))
+    return _doc("Slow resources", f"<main><h1>Slow resources</h1>{images}</main>", head)
+
+
+def _long(q: dict) -> str:
+    height = int(q.get("height", ["30000"])[0])
+    sections = "".join(
+        f"<section style='height:1000px;background:hsl({i * 37 % 360},40%,90%)'><h2>Section {i}</h2></section>"
+        for i in range(max(1, height // 1000))
+    )
+    return _doc("Long page", f"<main><h1>Long page</h1>{sections}</main>")
+
+
+RENDERERS = {"small": _small, "huge-dom": _huge_dom, "violations": _violations, "slow": _slow, "long": _long}
+ASSETS = {
+    "style.css": ("text/css", b"body{font-family:sans-serif}"),
+    "app.js": ("application/javascript", b"window.fixtureLoaded = true;"),
+    "pixel.gif": ("image/gif", PIXEL_GIF),
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        q = parse_qs(parts.query)
+        name = parts.path.strip("/")
+        if name == "robots.txt":
+            self._send(200, "text/plain", b"User-agent: *\nAllow: /\n")
+        elif name in RENDERERS:
+            self._send(200, "text/html; charset=utf-8", RENDERERS[name](q).encode("utf-8"))
+        elif name.startswith("asset/") and name[6:] in ASSETS:
+            time.sleep(float(q.get("delay", ["0"])[0]))
+            self._send(200, *ASSETS[name[6:]])
+        else:
+            self._send(404, "text/plain", b"not found")
+
+    def _send(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FixtureSite:
+    """The fixture server on a background thread: `with FixtureSite() as site: site.url("small")`."""
+
+    def __init__(self, port: int = 0):
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def url(self, page: str) -> str:
+        return f"{self.base_url}/{page}"
+
+    def __enter__(self) -> "FixtureSite":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8765)
+    args = ap.parse_args()
+    with FixtureSite(args.port) as site:
+        print(f"Serving {', '.join(site.url(p) for p in PAGES)}")
+        try:
+            site.thread.join()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()